@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for the Python console engine and Flask blueprint
+
+Runs fully offline and prints (or writes) a JSON report so results from two
+runs can be diffed to catch regressions in the console's hot paths. Failed
+requests are counted in the report and make the script exit non-zero, so a
+broken endpoint can't pass for a fast one:
+
+- ConsoleEngine.execute throughput and latency for trivial, print-heavy
+  and allocation-heavy snippets
+- session creation cost versus the number of live sessions
+- expose_global cost versus the number of live sessions
+- /execute latency through the Flask test client under concurrent threads
+- slowdown of a co-hosted endpoint while the console is busy
+
+Usage:
+    python benchmarks/python/bench_console.py [--quick] [--output results.json]
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import threading
+import time
+from typing import Callable, Dict, Any, List
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'src', 'python')))
+
+from in_app_debug_console import ConsoleEngine  # noqa: E402
+
+SNIPPETS = {
+    'trivial': '1 + 1',
+    'print_heavy': 'print("\\n".join(str(i) for i in range(2000)))',
+    'allocation_heavy': 'len([{"id": i, "name": str(i)} for i in range(20000)])',
+}
+
+
+def summarize(samples_ns: List[int]) -> Dict[str, float]:
+    """Latency percentiles in milliseconds"""
+    ordered = sorted(samples_ns)
+
+    def pct(p: float) -> float:
+        return ordered[min(len(ordered) - 1, int(p * len(ordered)))] / 1e6
+
+    return {
+        'count': len(ordered),
+        'mean_ms': statistics.mean(ordered) / 1e6,
+        'p50_ms': pct(0.50),
+        'p90_ms': pct(0.90),
+        'p99_ms': pct(0.99),
+        'max_ms': ordered[-1] / 1e6,
+    }
+
+
+def failed(response) -> bool:
+    """Whether a test-client response is an error (non-200 or success: False)"""
+    if response.status_code != 200:
+        return True
+    data = response.get_json(silent=True)
+    return isinstance(data, dict) and data.get('success') is False
+
+
+def time_calls(func: Callable[[], Any], iterations: int) -> List[int]:
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter_ns()
+        func()
+        samples.append(time.perf_counter_ns() - start)
+    return samples
+
+
+def bench_execute(iterations: int) -> Dict[str, Any]:
+    """Single-threaded execute() throughput and latency per snippet kind"""
+    results = {}
+    for name, snippet in SNIPPETS.items():
+        engine = ConsoleEngine(max_output_length=1_000_000)
+        warmup = engine.execute(snippet, 'bench')  # warm up the session
+        if not warmup['success']:
+            raise RuntimeError(f"Snippet {name!r} failed: {warmup.get('error')}")
+        samples = time_calls(lambda: engine.execute(snippet, 'bench'), iterations)
+        stats = summarize(samples)
+        stats['ops_per_sec'] = len(samples) / (sum(samples) / 1e9)
+        results[name] = stats
+    return results
+
+
+def bench_session_creation(session_counts: List[int], iterations: int) -> Dict[str, Any]:
+    """Cost of creating one more session with N sessions already live"""
+    results = {}
+    for live in session_counts:
+        engine = ConsoleEngine()
+        for i in range(live):
+            engine.get_session(f'live-{i}')
+        counter = iter(range(iterations))
+        samples = time_calls(lambda: engine.get_session(f'new-{next(counter)}'), iterations)
+        results[str(live)] = summarize(samples)
+    return results
+
+
+def bench_expose_global(session_counts: List[int], iterations: int) -> Dict[str, Any]:
+    """Cost of expose_global() with N sessions live"""
+    results = {}
+    for live in session_counts:
+        engine = ConsoleEngine()
+        for i in range(live):
+            engine.get_session(f'live-{i}')
+        samples = time_calls(lambda: engine.expose_global('value', object()), iterations)
+        results[str(live)] = summarize(samples)
+    return results
+
+
+def create_app():
+    """Host app with the console and a dummy endpoint"""
+    from flask import Flask, jsonify
+    from in_app_debug_console import create_console_blueprint
+
+    app = Flask('bench')
+    app.secret_key = 'bench'
+    app.register_blueprint(create_console_blueprint(
+        exposed_globals={'data': list(range(1000))},
+        max_output_length=1_000_000,
+        enable_logging=False
+    ))
+
+    @app.route('/ping')
+    def ping():
+        return jsonify({'total': sum(range(100))})
+
+    return app
+
+
+def run_threads(thread_count: int, worker: Callable[[List[int]], None]) -> List[int]:
+    """Run worker on N threads, each appending latencies to its own list"""
+    per_thread: List[List[int]] = [[] for _ in range(thread_count)]
+    threads = [threading.Thread(target=worker, args=(samples,)) for samples in per_thread]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return [sample for samples in per_thread for sample in samples]
+
+
+def bench_http_execute(thread_counts: List[int], requests_per_thread: int) -> Dict[str, Any]:
+    """/execute latency through the Flask test client under concurrency"""
+    app = create_app()
+    results = {}
+    for threads in thread_counts:
+        failures: List[int] = []
+
+        def worker(samples: List[int]) -> None:
+            client = app.test_client()
+            for _ in range(requests_per_thread):
+                start = time.perf_counter_ns()
+                response = client.post('/__console__/execute', json={'code': 'sum(data)'})
+                samples.append(time.perf_counter_ns() - start)
+                if failed(response):
+                    failures.append(response.status_code)
+
+        wall_start = time.perf_counter()
+        samples = run_threads(threads, worker)
+        wall = time.perf_counter() - wall_start
+        stats = summarize(samples)
+        stats['requests_per_sec'] = len(samples) / wall
+        stats['failures'] = len(failures)
+        results[str(threads)] = stats
+    return results
+
+
+def bench_cohosted_slowdown(console_threads: int, requests: int) -> Dict[str, Any]:
+    """Latency of /ping alone versus while console threads run heavy snippets"""
+    app = create_app()
+    ping_client = app.test_client()
+    ping_failures: List[int] = []
+    console_failures: List[int] = []
+
+    def ping() -> None:
+        response = ping_client.get('/ping')
+        if failed(response):
+            ping_failures.append(response.status_code)
+
+    def ping_latencies() -> List[int]:
+        return time_calls(ping, requests)
+
+    ping_latencies()  # warm up
+    idle = summarize(ping_latencies())
+
+    stop = threading.Event()
+    console_requests: List[int] = []
+
+    def console_load() -> None:
+        client = app.test_client()
+        while not stop.is_set():
+            response = client.post('/__console__/execute', json={'code': SNIPPETS['allocation_heavy']})
+            console_requests.append(1)
+            if failed(response):
+                console_failures.append(response.status_code)
+
+    load = [threading.Thread(target=console_load) for _ in range(console_threads)]
+    for thread in load:
+        thread.start()
+    try:
+        busy = summarize(ping_latencies())
+    finally:
+        stop.set()
+        for thread in load:
+            thread.join()
+
+    return {
+        'idle': idle,
+        'under_console_load': busy,
+        'console_threads': console_threads,
+        'p50_slowdown_ratio': busy['p50_ms'] / idle['p50_ms'],
+        'p99_slowdown_ratio': busy['p99_ms'] / idle['p99_ms'],
+        'console_requests': len(console_requests),
+        'failures': len(ping_failures) + len(console_failures),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--quick', action='store_true', help='Fewer iterations, for smoke runs')
+    parser.add_argument('--output', help='Write JSON results to this file instead of stdout')
+    args = parser.parse_args()
+
+    scale = 0.1 if args.quick else 1.0
+    iterations = max(10, int(500 * scale))
+    session_counts = [0, 100, 1000, 5000] if not args.quick else [0, 100, 1000]
+    thread_counts = [1, 4, 8]
+
+    results = {
+        'execute': bench_execute(iterations),
+        'session_creation': bench_session_creation(session_counts, iterations),
+        'expose_global': bench_expose_global(session_counts, max(10, iterations // 10)),
+        'http_execute': bench_http_execute(thread_counts, max(10, int(200 * scale))),
+        'cohosted_endpoint': bench_cohosted_slowdown(2, iterations),
+    }
+
+    failures = (sum(stats['failures'] for stats in results['http_execute'].values()) +
+                results['cohosted_endpoint']['failures'])
+    report = json.dumps({
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'quick': args.quick,
+        'failures': failures,
+        'results': results,
+    }, indent=2)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(report + '\n')
+    else:
+        print(report)
+
+    if failures:
+        print(f"{failures} benchmark requests failed; results measure the error path", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
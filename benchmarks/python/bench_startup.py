@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Startup benchmark for the Python debug console
+
+Measures how much importing the package and registering the console
+blueprint adds to an app's cold start. Every scenario runs in a fresh
+interpreter; timings cover only the scenario's statements, not interpreter
+startup.
+
+Usage:
+    python benchmarks/python/bench_startup.py [--runs 15] [--output startup.json]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+SRC_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'src', 'python'))
+
+# name -> (setup, measured statement)
+SCENARIOS = {
+    'package_import': ('', 'import in_app_debug_console'),
+    'engine_import': ('', 'from in_app_debug_console import ConsoleEngine'),
+    'flask_app': ('', 'import flask; app = flask.Flask("bench")'),
+    'flask_app_with_console': ('', (
+        'import flask; app = flask.Flask("bench")\n'
+        'from in_app_debug_console import create_console_blueprint\n'
+        'app.register_blueprint(create_console_blueprint(exposed_globals={"x": 1}))'
+    )),
+    'first_console_request': ((
+        'import flask; app = flask.Flask("bench"); app.secret_key = "bench"\n'
+        'from in_app_debug_console import create_console_blueprint\n'
+        'app.register_blueprint(create_console_blueprint())\n'
+        'client = app.test_client()\n'
+        'client.get("/")'
+    ), 'client.post("/__console__/execute", json={"code": "1 + 1"})'),
+}
+
+CHILD_TEMPLATE = """
+import sys, time, json
+sys.path.insert(0, {src!r})
+{setup}
+modules_before = len(sys.modules)
+start = time.perf_counter()
+{statement}
+elapsed = time.perf_counter() - start
+print(json.dumps({{'ms': elapsed * 1000, 'modules': len(sys.modules) - modules_before}}))
+"""
+
+
+def run_scenario(setup: str, statement: str, runs: int) -> dict:
+    """Run one scenario in fresh interpreters and summarize the timings"""
+    script = CHILD_TEMPLATE.format(src=SRC_DIR, setup=setup, statement=statement)
+    samples = []
+    modules = 0
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, '-c', script], check=True,
+                                capture_output=True, text=True).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        samples.append(result['ms'])
+        modules = result['modules']
+    return {
+        'median_ms': statistics.median(samples),
+        'min_ms': min(samples),
+        'max_ms': max(samples),
+        'modules_loaded': modules,
+        'runs': runs,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--runs', type=int, default=15)
+    parser.add_argument('--output', help='Write JSON results to this file instead of stdout')
+    args = parser.parse_args()
+
+    results = {name: run_scenario(setup, statement, args.runs)
+               for name, (setup, statement) in SCENARIOS.items()}
+    results['console_added_cold_start_ms'] = (
+        results['flask_app_with_console']['median_ms'] - results['flask_app']['median_ms']
+    )
+
+    report = json.dumps({'python': sys.version.split()[0], 'results': results}, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(report + '\n')
+    else:
+        print(report)
+
+
+if __name__ == '__main__':
+    main()
@@ -153,7 +153,9 @@ console_bp = create_console_blueprint(
         'datetime': datetime,
         'time': time,
         'os': os
-    }
+    },
+    # Reported by GET /__console__/caches alongside lru_cache hit rates
+    dict_caches={'app_data.cache': app_data['cache']}
 )
 
 app.register_blueprint(console_bp)
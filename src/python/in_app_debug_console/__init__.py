@@ -3,10 +3,53 @@ In-App Debug Console for Python/Flask Applications
 
 A secure, built-in mini REPL console for web applications that enables 
 developers to inspect server state and execute debug commands on a running app.
+
+Public names are imported on first access (PEP 562), so importing the package
+doesn't pull in Flask or any console machinery until it is actually used.
 """
 
-from .console_engine import ConsoleEngine
-from .flask_integration import ConsoleBlueprint, create_console_blueprint
+import importlib
+
+# Avoids importing typing at runtime; type checkers treat this name as True
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from .console_engine import ConsoleEngine
+    from .cluster import ClusterNode
+    from .audit import AuditLog
+    from .request_capture import RequestCapture
+    from .cache_census import CacheCensus
+    from .artifacts import ArtifactStore
+    from .flask_integration import ConsoleBlueprint, create_console_blueprint
+    from .async_engine import AsyncConsoleEngine
+    from .asgi_integration import ConsoleASGIApp, create_console_asgi_app
 
 __version__ = "1.0.0"
-__all__ = ["ConsoleEngine", "ConsoleBlueprint", "create_console_blueprint"]
\ No newline at end of file
+__all__ = ["ConsoleEngine", "ClusterNode", "AuditLog", "RequestCapture", "CacheCensus", "ArtifactStore", "ConsoleBlueprint", "create_console_blueprint",
+           "AsyncConsoleEngine", "ConsoleASGIApp", "create_console_asgi_app"]
+
+# Public name -> submodule defining it
+_LAZY_ATTRIBUTES = {
+    "ConsoleEngine": ".console_engine",
+    "ClusterNode": ".cluster",
+    "AuditLog": ".audit",
+    "RequestCapture": ".request_capture",
+    "CacheCensus": ".cache_census",
+    "ArtifactStore": ".artifacts",
+    "ConsoleBlueprint": ".flask_integration",
+    "create_console_blueprint": ".flask_integration",
+    "AsyncConsoleEngine": ".async_engine",
+    "ConsoleASGIApp": ".asgi_integration",
+    "create_console_asgi_app": ".asgi_integration",
+}
+
+
+def __getattr__(name: str) -> object:
+    if name not in _LAZY_ATTRIBUTES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_LAZY_ATTRIBUTES[name], __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list:
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,262 @@
+import io
+import os
+import re
+import tempfile
+import threading
+import time
+import uuid
+from typing import Dict, Any, Optional, Callable, Iterator, Tuple
+
+
+# uuid4 hex, optionally compressed, optionally still being written
+_ARTIFACT_FILE = re.compile(r'^([0-9a-f]{32})\.txt(\.gz)?(\.part)?$')
+_ARTIFACT_ID = re.compile(r'^[0-9a-f]{32}$')
+
+PARTIAL_SUFFIX = '.part'
+
+
+class ArtifactStore:
+    """
+    Directory of console results too large to return inline.
+
+    Artifacts are written to a ".part" file, optionally gzip-compressed, and
+    renamed into place once complete. Each one is capped at max_artifact_bytes
+    of (uncompressed) text. Range requests on a compressed artifact address
+    the gzip stream, so only use compress when artifacts are downloaded
+    whole. Files older than max_age and the oldest files beyond
+    max_total_bytes are garbage-collected when an artifact is created and
+    finished, and by collect_if_due() (at most every collect_interval
+    seconds) for directories that stop receiving new artifacts.
+
+    Lookups go to the directory rather than an in-memory index, so workers
+    sharing a directory can serve each other's artifacts.
+    """
+
+    def __init__(self, directory: Optional[str] = None,
+                 max_artifact_bytes: int = 64 * 1024 * 1024,
+                 max_total_bytes: int = 512 * 1024 * 1024,
+                 max_age: float = 3600.0,
+                 compress: bool = False,
+                 collect_interval: float = 60.0):
+        self.directory = directory or tempfile.mkdtemp(prefix='debug-console-artifacts-')
+        os.makedirs(self.directory, mode=0o700, exist_ok=True)
+        self.max_artifact_bytes = max_artifact_bytes
+        self.max_total_bytes = max_total_bytes
+        self.max_age = max_age
+        self.compress = compress
+        self.collect_interval = collect_interval
+        self._last_collect = 0.0
+
+        self.created = 0
+        self.collected = 0
+        # Updated by each collection and each finished artifact
+        self.artifact_count = 0
+        self.total_bytes = 0
+        self._lock = threading.Lock()
+
+    def _path(self, artifact_id: str, compressed: bool) -> str:
+        return os.path.join(self.directory, artifact_id + ('.txt.gz' if compressed else '.txt'))
+
+    def create(self) -> 'ArtifactWriter':
+        """Start a new artifact"""
+        self.collect()
+        with self._lock:
+            self.created += 1
+        return ArtifactWriter(self, uuid.uuid4().hex)
+
+    def find(self, artifact_id: str) -> Optional[Dict[str, Any]]:
+        """Path and details of a finished artifact, or None if unknown or collected"""
+        if not _ARTIFACT_ID.match(artifact_id):
+            return None
+        for compressed in (True, False):
+            path = self._path(artifact_id, compressed)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            return {
+                'id': artifact_id,
+                'path': path,
+                'compressed': compressed,
+                'bytes': stat.st_size,
+                'created': stat.st_mtime,
+            }
+        return None
+
+    def collect_if_due(self) -> int:
+        """Collect unless the last collection was less than collect_interval ago"""
+        if time.monotonic() - self._last_collect < self.collect_interval:
+            return 0
+        return self.collect()
+
+    def collect(self, keep: Optional[str] = None) -> int:
+        """
+        Delete expired artifacts and the oldest ones over the size quota
+        (never the file at path keep); returns how many were removed
+        """
+        self._last_collect = time.monotonic()
+        now = time.time()
+        entries = []
+        with os.scandir(self.directory) as scan:
+            for entry in scan:
+                match = _ARTIFACT_FILE.match(entry.name)
+                if not match:
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path, bool(match.group(3))))
+
+        entries.sort()
+        total = sum(size for _, size, _, _ in entries)
+        count = len(entries)
+        removed = 0
+        for mtime, size, path, partial in entries:
+            expired = now - mtime > self.max_age
+            # Files still being written only go once they have been abandoned
+            if path == keep or (not expired and (partial or total <= self.max_total_bytes)):
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass  # collected by another worker
+            total -= size
+            count -= 1
+            removed += 1
+
+        with self._lock:
+            self.collected += removed
+            self.artifact_count = count
+            self.total_bytes = total
+        return removed
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'directory': self.directory,
+            'artifacts': self.artifact_count,
+            'bytes': self.total_bytes,
+            'created': self.created,
+            'collected': self.collected,
+        }
+
+
+class ArtifactWriter:
+    """Writes one artifact; text past the store's size cap is dropped"""
+
+    def __init__(self, store: ArtifactStore, artifact_id: str):
+        self._store = store
+        self.id = artifact_id
+        self.compressed = store.compress
+        self.max_bytes = store.max_artifact_bytes
+        self.path = store._path(artifact_id, self.compressed)
+        self._partial_path = self.path + PARTIAL_SUFFIX
+        self.bytes = 0
+        self.truncated = False
+        self.closed = False
+
+        fd = os.open(self._partial_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        self._raw = os.fdopen(fd, 'wb')
+        if self.compressed:
+            import gzip
+            # Level 1: most of the size win on text for a fraction of the CPU
+            self._file = gzip.GzipFile(fileobj=self._raw, mode='wb', compresslevel=1)
+        else:
+            self._file = self._raw
+
+    def write(self, text: str) -> None:
+        if self.truncated or not text:
+            return
+        data = text.encode('utf-8', 'replace')
+        room = self.max_bytes - self.bytes
+        if len(data) > room:
+            data = data[:room]
+            self.truncated = True
+        self._file.write(data)
+        self.bytes += len(data)
+        if self.truncated:
+            self._file.write(f"\n... (artifact truncated at {self.max_bytes} bytes)\n".encode())
+
+    def close(self) -> Dict[str, Any]:
+        """Finish the artifact and move it into place"""
+        if not self.closed:
+            self.closed = True
+            self._file.close()
+            self._raw.close()
+            os.replace(self._partial_path, self.path)
+            # Enforce the quota with this artifact counted, keeping it for its result
+            self._store.collect(keep=self.path)
+        return {
+            'id': self.id,
+            'bytes': self.bytes,
+            'compressed': self.compressed,
+            'truncated': self.truncated,
+        }
+
+
+class SpooledOutput(io.TextIOBase):
+    """
+    Text buffer that keeps the first `threshold` characters in memory and,
+    once more than that is written, streams everything to a new artifact.
+    """
+
+    def __init__(self, store: ArtifactStore, threshold: int,
+                 callback: Optional[Callable[[str], None]] = None):
+        self._store = store
+        self.threshold = threshold
+        self._callback = callback
+        self._head = io.StringIO()
+        self._head_length = 0
+        self._artifact: Optional[ArtifactWriter] = None
+        self.length = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, text: str) -> int:
+        if not text:
+            return 0
+        if self._callback:
+            self._callback(text)
+
+        if self._artifact is None and self.length + len(text) > self.threshold:
+            self._artifact = self._store.create()
+            self._artifact.write(self._head.getvalue())
+        if self._head_length < self.threshold:
+            head = text[:self.threshold - self._head_length]
+            self._head.write(head)
+            self._head_length += len(head)
+        if self._artifact is not None:
+            self._artifact.write(text)
+
+        self.length += len(text)
+        return len(text)
+
+    def finish(self) -> Tuple[str, Optional[Dict[str, Any]]]:
+        """The in-memory head and, if the text spilled, the closed artifact's details"""
+        artifact = self._artifact.close() if self._artifact is not None else None
+        return self._head.getvalue(), artifact
+
+
+def iter_str(value: Any, fallback: Callable[[Any], str] = str) -> Iterator[str]:
+    """
+    Yield str(value) in pieces, formatting the items of builtin containers one
+    at a time so a huge list or dict is never rendered as a single string.
+    Other values are formatted whole with fallback (str, or repr for display).
+    """
+    kind = type(value)
+    if kind is dict:
+        yield '{'
+        for index, (key, item) in enumerate(value.items()):
+            yield f"{', ' if index else ''}{key!r}: {item!r}"
+        yield '}'
+    elif kind in (list, tuple) or (kind is set and value):
+        opening, closing = {list: '[]', tuple: '()', set: '{}'}[kind]
+        yield opening
+        for index, item in enumerate(value):
+            yield f"{', ' if index else ''}{item!r}"
+        if kind is tuple and len(value) == 1:
+            yield ','
+        yield closing
+    else:
+        yield fallback(value)
@@ -0,0 +1,304 @@
+import inspect
+import json
+import logging
+import math
+import threading
+import uuid
+from typing import Callable, Optional, Dict, Any, List, Tuple
+
+from .async_engine import AsyncConsoleEngine
+from .console_engine import ConsoleEngine
+from .metrics import MetricsRegistry
+
+
+# Largest request body accepted by the console endpoints
+MAX_BODY_BYTES = 1024 * 1024
+
+SESSION_HEADER = b'x-console-session'
+
+
+class ConsoleASGIApp:
+    """
+    ASGI application exposing the console's execute/stats/clear/stream
+    endpoints for asyncio servers (Starlette, Quart, FastAPI, ...).
+
+    Mount it under a prefix in the host app. Sessions are identified by the
+    X-Console-Session header or a session_id field in the JSON body; new
+    session IDs are returned in every execute response.
+
+    The auth function receives the ASGI scope and may be sync or async.
+    Like ConsoleBlueprint, the engine is only built on the first authorized
+    request.
+    """
+
+    def __init__(self, auth_func: Optional[Callable] = None,
+                 engine_factory: Optional[Callable[[], AsyncConsoleEngine]] = None,
+                 enable_logging: bool = True):
+        self.auth_func = auth_func
+        self._engine_factory = engine_factory or AsyncConsoleEngine
+        self._engine: Optional[AsyncConsoleEngine] = None
+        self._engine_lock = threading.Lock()
+        self.enable_logging = enable_logging
+        if enable_logging:
+            self.logger = logging.getLogger('debug_console.asgi')
+
+        self._routes: Dict[Tuple[str, str], Callable] = {
+            ('POST', '/execute'): self._execute,
+            ('POST', '/evaluate'): self._evaluate,
+            ('POST', '/stream'): self._stream,
+            ('GET', '/stats'): self._stats,
+            ('GET', '/metrics'): self._metrics,
+        }
+
+    @property
+    def engine(self) -> AsyncConsoleEngine:
+        """The async engine, built on first use"""
+        if self._engine is None:
+            with self._engine_lock:
+                if self._engine is None:
+                    self._engine = self._engine_factory()
+        return self._engine
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            return
+
+        if not await self._is_authorized(scope):
+            await self._send_json(send, {'success': False, 'error': 'Access denied to debug console'}, 403)
+            return
+
+        path = scope['path']
+        root_path = scope.get('root_path', '')
+        if root_path and path.startswith(root_path):
+            path = path[len(root_path):]
+        path = '/' + path.strip('/')
+        method = scope['method']
+
+        if method == 'POST' and path.startswith('/clear/'):
+            await self._clear(scope, send, path[len('/clear/'):])
+            return
+
+        handler = self._routes.get((method, path))
+        if handler is None:
+            await self._send_json(send, {'success': False, 'error': 'Not found'}, 404)
+            return
+
+        body = None
+        if method == 'POST':
+            body = await self._read_json(scope, receive, send)
+            if body is None:
+                return
+        await handler(scope, send, body)
+
+    async def _lifespan(self, receive, send) -> None:
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                if self._engine is not None:
+                    self._engine.close()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def _is_authorized(self, scope) -> bool:
+        if self.auth_func is None:
+            return True
+        allowed = self.auth_func(scope)
+        if inspect.isawaitable(allowed):
+            allowed = await allowed
+        return bool(allowed)
+
+    async def _read_json(self, scope, receive, send) -> Optional[Dict[str, Any]]:
+        """Read and decode a JSON body, sending an error response on failure"""
+        headers = dict(scope.get('headers', []))
+        if not headers.get(b'content-type', b'').startswith(b'application/json'):
+            await self._send_json(send, {'success': False, 'error': 'Content-Type must be application/json'}, 400)
+            return None
+
+        chunks: List[bytes] = []
+        size = 0
+        more_body = True
+        while more_body:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return None
+            chunk = message.get('body', b'')
+            size += len(chunk)
+            if size > MAX_BODY_BYTES:
+                await self._send_json(send, {'success': False, 'error': 'Request body too large'}, 413)
+                return None
+            chunks.append(chunk)
+            more_body = message.get('more_body', False)
+
+        try:
+            data = json.loads(b''.join(chunks) or b'{}')
+        except ValueError:
+            await self._send_json(send, {'success': False, 'error': 'Invalid JSON body'}, 400)
+            return None
+        if not isinstance(data, dict):
+            await self._send_json(send, {'success': False, 'error': 'JSON body must be an object'}, 400)
+            return None
+        return data
+
+    async def _strings(self, send, body: Dict[str, Any], *fields: str) -> bool:
+        """Check that the given body fields are strings when present, sending a 400 if not"""
+        for field in fields:
+            value = body.get(field)
+            if value is not None and not isinstance(value, str):
+                await self._send_json(send, {'success': False, 'error': f'{field} must be a string'}, 400)
+                return False
+        return True
+
+    async def _timeout(self, send, body: Dict[str, Any]) -> Tuple[bool, Optional[float]]:
+        """
+        Validate a client-requested timeout, sending an error response if it is invalid
+
+        Clients may shorten the engine's timeout but never extend it.
+        Returns (ok, timeout); timeout is None when the engine default applies.
+        """
+        requested = body.get('timeout')
+        if requested is None:
+            return True, None
+        if (isinstance(requested, bool) or not isinstance(requested, (int, float)) or
+                not math.isfinite(requested) or requested <= 0):
+            await self._send_json(send, {'success': False, 'error': 'timeout must be a positive number'}, 400)
+            return False, None
+        return True, min(requested, self.engine.engine.timeout)
+
+    def _session_id(self, scope, body: Dict[str, Any]) -> str:
+        session_id = body.get('session_id')
+        if not session_id:
+            session_id = dict(scope.get('headers', [])).get(SESSION_HEADER, b'').decode('latin-1')
+        return session_id or str(uuid.uuid4())
+
+    async def _execute(self, scope, send, body: Dict[str, Any]) -> None:
+        if not await self._strings(send, body, 'code', 'session_id'):
+            return
+        code = (body.get('code') or '').strip()
+        if not code:
+            await self._send_json(send, {'success': False, 'error': 'No code provided'})
+            return
+
+        ok, timeout = await self._timeout(send, body)
+        if not ok:
+            return
+
+        session_id = self._session_id(scope, body)
+        if self.enable_logging:
+            self.logger.info("Executing code in session %s: %r", session_id, code[:100])
+
+        result = await self.engine.execute_async(code, session_id, timeout)
+        result['session_id'] = session_id
+        await self._send_json(send, result)
+
+    async def _evaluate(self, scope, send, body: Dict[str, Any]) -> None:
+        if not await self._strings(send, body, 'expression', 'session_id'):
+            return
+        expression = (body.get('expression') or '').strip()
+        if not expression:
+            await self._send_json(send, {'success': False, 'error': 'No expression provided'})
+            return
+
+        ok, timeout = await self._timeout(send, body)
+        if not ok:
+            return
+
+        session_id = self._session_id(scope, body)
+        result = await self.engine.evaluate_async(expression, session_id, timeout)
+        result['session_id'] = session_id
+        await self._send_json(send, result)
+
+    async def _stream(self, scope, send, body: Dict[str, Any]) -> None:
+        """Stream output chunks and the final result as newline-delimited JSON"""
+        if not await self._strings(send, body, 'code', 'session_id'):
+            return
+        code = (body.get('code') or '').strip()
+        if not code:
+            await self._send_json(send, {'success': False, 'error': 'No code provided'})
+            return
+
+        ok, timeout = await self._timeout(send, body)
+        if not ok:
+            return
+
+        session_id = self._session_id(scope, body)
+        if self.enable_logging:
+            self.logger.info("Streaming code in session %s: %r", session_id, code[:100])
+
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [(b'content-type', b'application/x-ndjson'), (b'cache-control', b'no-cache')],
+        })
+        async for event in self.engine.stream_async(code, session_id, timeout):
+            if event['type'] == 'result':
+                event['session_id'] = session_id
+            await send({'type': 'http.response.body',
+                        'body': json.dumps(event, default=str).encode() + b'\n',
+                        'more_body': True})
+        await send({'type': 'http.response.body', 'body': b'', 'more_body': False})
+
+    async def _stats(self, scope, send, body) -> None:
+        await self._send_json(send, self.engine.get_stats())
+
+    async def _metrics(self, scope, send, body) -> None:
+        # Like the blueprint, a scrape doesn't build the engine
+        text = self._engine.engine.metrics.render() if self._engine is not None else ''
+        await self._send(send, 200, text.encode(), MetricsRegistry.CONTENT_TYPE.encode())
+
+    async def _clear(self, scope, send, session_id: str) -> None:
+        self.engine.clear_session(session_id)
+        if self.enable_logging:
+            self.logger.info("Cleared session %s", session_id)
+        await self._send_json(send, {'success': True, 'message': f'Session {session_id} cleared'})
+
+    async def _send_json(self, send, data: Dict[str, Any], status: int = 200) -> None:
+        await self._send(send, status, json.dumps(data, default=str).encode(), b'application/json')
+
+    async def _send(self, send, status: int, body: bytes, content_type: bytes) -> None:
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': [(b'content-type', content_type),
+                        (b'content-length', str(len(body)).encode())],
+        })
+        await send({'type': 'http.response.body', 'body': body})
+
+
+def create_console_asgi_app(auth_func: Optional[Callable] = None,
+                            timeout: int = 5,
+                            max_output_length: int = 10000,
+                            exposed_globals: Optional[Dict[str, Any]] = None,
+                            max_workers: int = 4,
+                            enable_logging: bool = True) -> ConsoleASGIApp:
+    """
+    Create a debug console ASGI app with the given configuration
+
+    Args:
+        auth_func: Function (sync or async) taking the ASGI scope and
+            returning whether the request may use the console
+        timeout: Code execution timeout in seconds
+        max_output_length: Maximum length of output before truncation
+        exposed_globals: Global variables to expose in console
+        max_workers: Size of the thread pool snippets run on
+        enable_logging: Whether to enable audit logging
+
+    Returns:
+        ASGI application to mount in the host app
+    """
+    def engine_factory() -> AsyncConsoleEngine:
+        return AsyncConsoleEngine(
+            ConsoleEngine(
+                timeout=timeout,
+                max_output_length=max_output_length,
+                exposed_globals=exposed_globals
+            ),
+            max_workers=max_workers
+        )
+
+    return ConsoleASGIApp(auth_func=auth_func, engine_factory=engine_factory,
+                          enable_logging=enable_logging)
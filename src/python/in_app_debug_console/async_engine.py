@@ -0,0 +1,220 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Optional, AsyncIterator, List
+
+from .console_engine import ConsoleEngine, TimeoutError as EngineTimeoutError, _set_async_exc
+
+
+class ExecutionDeadlineExceeded(EngineTimeoutError):
+    """Raised inside a worker thread when an async execution passes its deadline"""
+
+    def __init__(self, message: str = 'Code execution exceeded its deadline'):
+        super().__init__(message)
+
+
+class ExecutionCancelled(Exception):
+    """Raised inside a worker thread when the awaiting task is cancelled"""
+
+    def __init__(self, message: str = 'Code execution was cancelled'):
+        super().__init__(message)
+
+
+class _WorkerCall:
+    """Tracks the pool thread running one execution so it can be interrupted"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.thread_id: Optional[int] = None
+        self.running = False
+
+    def run(self, func, *args) -> Dict[str, Any]:
+        try:
+            try:
+                with self.lock:
+                    self.thread_id = threading.get_ident()
+                    self.running = True
+                return func(*args)
+            finally:
+                with self.lock:
+                    self.running = False
+                    # Drop an interrupt that arrived just as the call finished
+                    _set_async_exc(self.thread_id, None)
+        except (ExecutionDeadlineExceeded, ExecutionCancelled) as e:
+            return {'success': False, 'error': str(e), 'output': ''}
+
+    def interrupt(self, exc_type: type) -> None:
+        with self.lock:
+            if self.running:
+                _set_async_exc(self.thread_id, exc_type)
+
+
+class AsyncConsoleEngine:
+    """
+    Async facade over ConsoleEngine for asyncio/ASGI applications.
+
+    Snippets run on a bounded thread pool so the event loop is never blocked.
+    Deadlines and task cancellation interrupt the worker thread by raising an
+    exception in it; code blocked inside a C call is interrupted once that
+    call returns.
+
+    Sessions also get helpers for inspecting the host loop: run_async(coro)
+    awaits a coroutine on the loop with a deadline, and all_tasks() /
+    tasks_by_coroutine() summarize its tasks.
+    """
+
+    def __init__(self, console_engine: Optional[ConsoleEngine] = None,
+                 max_workers: int = 4, max_pending: int = 16,
+                 interrupt_grace: float = 1.0):
+        self.engine = console_engine or ConsoleEngine()
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.interrupt_grace = interrupt_grace
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._executor = ThreadPoolExecutor(max_workers=max_workers,
+                                            thread_name_prefix='debug-console')
+        self._in_flight = 0
+
+        self.engine.expose_global('asyncio', asyncio)
+        self.engine.expose_global('run_async', self.run_async)
+        self.engine.expose_global('all_tasks', self.all_tasks)
+        self.engine.expose_global('tasks_by_coroutine', self.tasks_by_coroutine)
+
+    async def execute_async(self, code_string: str, session_id: str,
+                            timeout: Optional[float] = None,
+                            output_callback=None) -> Dict[str, Any]:
+        """Execute code on the worker pool without blocking the event loop"""
+        return await self._run(self.engine.execute, timeout, code_string, session_id, output_callback)
+
+    async def evaluate_async(self, expression: str, session_id: str,
+                             timeout: Optional[float] = None) -> Dict[str, Any]:
+        """Evaluate an expression on the worker pool"""
+        return await self._run(self.engine.evaluate_expression, timeout, expression, session_id)
+
+    async def stream_async(self, code_string: str, session_id: str,
+                           timeout: Optional[float] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Execute code, yielding output chunks as they are written and then the result"""
+        loop = asyncio.get_running_loop()
+        chunks: asyncio.Queue = asyncio.Queue()
+
+        def on_output(text: str) -> None:
+            loop.call_soon_threadsafe(chunks.put_nowait, text)
+
+        task = asyncio.ensure_future(self.execute_async(code_string, session_id, timeout, on_output))
+        try:
+            while not task.done() or not chunks.empty():
+                getter = asyncio.ensure_future(chunks.get())
+                done, _ = await asyncio.wait({getter, task}, return_when=asyncio.FIRST_COMPLETED)
+                if getter in done:
+                    yield {'type': 'output', 'data': getter.result()}
+                else:
+                    getter.cancel()
+            # Output scheduled by the worker right before it finished
+            await asyncio.sleep(0)
+            while not chunks.empty():
+                yield {'type': 'output', 'data': chunks.get_nowait()}
+            yield dict(task.result(), type='result')
+        finally:
+            if not task.done():
+                task.cancel()
+
+    async def _run(self, func, timeout: Optional[float], *args) -> Dict[str, Any]:
+        loop = asyncio.get_running_loop()
+        self.loop = loop
+        self._loop_thread_id = threading.get_ident()
+
+        if self._in_flight >= self.max_workers + self.max_pending:
+            return {'success': False, 'error': 'Console is busy; too many executions in progress'}
+
+        timeout = self.engine.timeout if timeout is None else timeout
+        call = _WorkerCall()
+        future = loop.run_in_executor(self._executor, call.run, func, *args)
+        self._in_flight += 1
+        future.add_done_callback(self._on_done)
+
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), timeout)
+        except asyncio.TimeoutError:
+            call.interrupt(ExecutionDeadlineExceeded)
+        except asyncio.CancelledError:
+            call.interrupt(ExecutionCancelled)
+            raise
+
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), self.interrupt_grace)
+        except asyncio.TimeoutError:
+            return {
+                'success': False,
+                'error': f'Code execution timed out after {timeout} seconds '
+                         '(worker thread still blocked)',
+                'output': '',
+            }
+
+    def _on_done(self, future) -> None:
+        self._in_flight -= 1
+
+    def _require_loop(self) -> asyncio.AbstractEventLoop:
+        if self.loop is None:
+            raise RuntimeError("No host event loop yet; run code through execute_async first")
+        if threading.get_ident() == self._loop_thread_id:
+            raise RuntimeError("run_async() can't be called from the event loop thread")
+        return self.loop
+
+    def run_async(self, awaitable, timeout: Optional[float] = None) -> Any:
+        """Run a coroutine on the host event loop and wait for its result (from a snippet)"""
+        loop = self._require_loop()
+        future = asyncio.run_coroutine_threadsafe(_await(awaitable), loop)
+        try:
+            return future.result(self.engine.timeout if timeout is None else timeout)
+        except BaseException:
+            future.cancel()
+            raise
+
+    def all_tasks(self) -> List[Dict[str, Any]]:
+        """Summaries of the host loop's unfinished tasks"""
+        return self.run_async(_snapshot_tasks())
+
+    def tasks_by_coroutine(self) -> Dict[str, int]:
+        """Count of the host loop's pending tasks per coroutine, largest first"""
+        counts: Dict[str, int] = {}
+        for task in self.all_tasks():
+            counts[task['coroutine']] = counts.get(task['coroutine'], 0) + 1
+        return dict(sorted(counts.items(), key=lambda item: item[1], reverse=True))
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = self.engine.get_stats()
+        stats['in_flight'] = self._in_flight
+        stats['max_workers'] = self.max_workers
+        return stats
+
+    def clear_session(self, session_id: str) -> None:
+        self.engine.clear_session(session_id)
+
+    def close(self) -> None:
+        """Shut down the worker pool"""
+        self._executor.shutdown(wait=False)
+
+
+async def _await(awaitable) -> Any:
+    return await awaitable
+
+
+async def _snapshot_tasks() -> List[Dict[str, Any]]:
+    current = asyncio.current_task()
+    tasks = []
+    for task in asyncio.all_tasks():
+        if task is current:
+            continue
+        coro = task.get_coro()
+        frames = task.get_stack(limit=1)
+        location = None
+        if frames:
+            frame = frames[-1]
+            location = f'{frame.f_code.co_filename}:{frame.f_lineno} in {frame.f_code.co_name}'
+        tasks.append({
+            'name': task.get_name() if hasattr(task, 'get_name') else repr(task),
+            'coroutine': getattr(coro, '__qualname__', type(coro).__name__),
+            'awaiting_at': location,
+        })
+    return tasks
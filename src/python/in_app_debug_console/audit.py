@@ -0,0 +1,218 @@
+import atexit
+import json
+import os
+import queue
+import threading
+import time
+from collections import deque
+from typing import Dict, Any, Optional, List
+
+
+FSYNC_POLICIES = ('never', 'batch', 'interval')
+
+# Queued by close() to stop the writer once everything before it is written
+_STOP = object()
+
+
+class AuditLog:
+    """
+    Structured audit trail written off the request path.
+
+    record() only appends to a bounded queue and an in-memory history ring;
+    a background thread drains the queue in batches into a rotating JSONL
+    file. When the queue is full new events are dropped and counted rather
+    than blocking the request. close() (also run at interpreter exit) writes
+    whatever is still queued.
+    """
+
+    def __init__(self, path: Optional[str] = None, max_queue: int = 10000,
+                 batch_size: int = 256, flush_interval: float = 1.0,
+                 max_bytes: int = 10 * 1024 * 1024, backup_count: int = 5,
+                 fsync: str = 'batch', fsync_interval: float = 5.0,
+                 history_size: int = 1000):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"fsync must be one of {FSYNC_POLICIES}, got {fsync!r}")
+
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+        self.history: deque = deque(maxlen=history_size)
+
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._writer: Optional[threading.Thread] = None
+        self._writer_pid: Optional[int] = None
+        self._lock = threading.Lock()
+        self._counts_lock = threading.Lock()
+        self._atexit_registered = False
+        self._file = None
+        self._last_fsync = 0.0
+
+        self.recorded = 0
+        self.dropped = 0
+        self.written = 0
+        self.batches = 0
+        self.write_errors = 0
+
+    def record(self, event: str, **fields: Any) -> bool:
+        """Queue an audit event; returns False if it was dropped"""
+        entry = {'ts': time.time(), 'event': event, **fields}
+        self.history.append(entry)
+        with self._counts_lock:
+            self.recorded += 1
+
+        if self.path is None:
+            return True
+
+        if self._writer_pid != os.getpid():
+            self._start_writer()
+
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            with self._counts_lock:
+                self.dropped += 1
+            return False
+        return True
+
+    def query(self, limit: int = 100, event: Optional[str] = None,
+              user: Optional[str] = None, session_id: Optional[str] = None,
+              success: Optional[bool] = None, since: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Return the most recent matching events from the history ring, newest first"""
+        matches = []
+        for entry in reversed(list(self.history)):
+            if event is not None and entry.get('event') != event:
+                continue
+            if user is not None and entry.get('user') != user:
+                continue
+            if session_id is not None and entry.get('session_id') != session_id:
+                continue
+            if success is not None and entry.get('success') != success:
+                continue
+            if since is not None and entry['ts'] < since:
+                break
+            matches.append(entry)
+            if len(matches) >= limit:
+                break
+        return matches
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get queue and writer counters"""
+        return {
+            'recorded': self.recorded,
+            'dropped': self.dropped,
+            'written': self.written,
+            'batches': self.batches,
+            'write_errors': self.write_errors,
+            'queue_depth': self._queue.qsize(),
+            'history_size': len(self.history),
+        }
+
+    def flush(self) -> None:
+        """Block until every queued event has been written"""
+        if self._writer_pid == os.getpid():
+            self._queue.join()
+
+    def close(self, timeout: float = 5.0) -> None:
+        """
+        Write every queued event, fsync the file (unless fsync='never') and
+        stop the writer. Registered with atexit; a later record() starts a
+        new writer.
+        """
+        with self._lock:
+            if self._writer_pid != os.getpid():
+                return
+            self._queue.put(_STOP)
+            self._writer.join(timeout)
+            if self._writer.is_alive():
+                return  # stuck on a write; leave the file to it
+            self._writer = None
+            self._writer_pid = None
+            if self._file is not None:
+                try:
+                    if self.fsync != 'never':
+                        os.fsync(self._file.fileno())
+                    self._file.close()
+                except OSError:
+                    self.write_errors += 1
+                self._file = None
+
+    def _start_writer(self) -> None:
+        with self._lock:
+            if self._writer_pid == os.getpid():
+                return
+            if self._writer_pid is not None:
+                # A writer inherited across fork() is not running in this process
+                self._queue = queue.Queue(maxsize=self._queue.maxsize)
+                self._file = None
+            if not self._atexit_registered:
+                atexit.register(self.close)
+                self._atexit_registered = True
+            self._writer = threading.Thread(target=self._run, name='debug-console-audit',
+                                            daemon=True)
+            self._writer_pid = os.getpid()
+            self._writer.start()
+
+    def _run(self) -> None:
+        running = True
+        while running:
+            try:
+                batch = [self._queue.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                continue
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            entries = [entry for entry in batch if entry is not _STOP]
+            running = len(entries) == len(batch)
+            try:
+                if entries:
+                    self._write_batch(entries)
+            except Exception:
+                self.write_errors += 1
+                self._file = None
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _write_batch(self, batch: List[Dict[str, Any]]) -> None:
+        data = ''.join(json.dumps(entry, default=str) + '\n' for entry in batch).encode()
+
+        if self._file is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._file = open(self.path, 'ab')
+        elif self._file.tell() + len(data) > self.max_bytes:
+            self._rotate()
+
+        self._file.write(data)
+        self._file.flush()
+
+        now = time.monotonic()
+        if self.fsync == 'batch' or (self.fsync == 'interval' and
+                                     now - self._last_fsync >= self.fsync_interval):
+            os.fsync(self._file.fileno())
+            self._last_fsync = now
+
+        self.written += len(batch)
+        self.batches += 1
+
+    def _rotate(self) -> None:
+        """Rotate path -> path.1 -> ... -> path.<backup_count>"""
+        self._file.close()
+        for index in range(self.backup_count - 1, 0, -1):
+            source = f'{self.path}.{index}'
+            if os.path.exists(source):
+                os.replace(source, f'{self.path}.{index + 1}')
+        if self.backup_count > 0:
+            os.replace(self.path, f'{self.path}.1')
+        else:
+            os.remove(self.path)
+        self._file = open(self.path, 'ab')
@@ -0,0 +1,205 @@
+import functools
+import itertools
+import sys
+import threading
+from typing import Dict, Any, Optional, Tuple
+
+
+_LRU_WRAPPER_TYPE = type(functools.lru_cache()(lambda: None))
+
+# Containers _estimate_size() looks inside
+_CONTAINERS = (dict, list, tuple, set, frozenset)
+
+
+def _estimate_size(obj: Any, sample_size: int = 100, depth: int = 3) -> int:
+    """
+    Estimate the deep size of obj in bytes.
+
+    Large containers are sampled and the per-item size extrapolated, so the
+    cost is bounded regardless of how big a cache has grown.
+    """
+    size = sys.getsizeof(obj)
+    if depth <= 0 or not isinstance(obj, _CONTAINERS) or not obj:
+        return size
+
+    # Copy the sample first: live caches may be resized by other threads, which
+    # makes iteration raise "dictionary changed size during iteration"
+    for _ in range(3):
+        try:
+            length = len(obj)
+            sample = list(itertools.islice(obj.items() if isinstance(obj, dict) else obj, sample_size))
+            break
+        except RuntimeError:
+            continue
+    else:
+        return size
+    if not sample:
+        return size
+
+    sampled_bytes = 0
+    for item in sample:
+        if isinstance(obj, dict):
+            key, value = item
+            sampled_bytes += (_estimate_size(key, sample_size, depth - 1) +
+                              _estimate_size(value, sample_size, depth - 1))
+        else:
+            sampled_bytes += _estimate_size(item, sample_size, depth - 1)
+
+    return size + int(sampled_bytes / len(sample) * length)
+
+
+class _LruCacheRef:
+    """Where an lru_cache wrapper lives, so it can be replaced when resized"""
+
+    def __init__(self, name: str, owner: Any, attr: str, wrapper: Any, kind: Optional[type]):
+        self.name = name
+        self.owner = owner
+        self.attr = attr
+        self.wrapper = wrapper
+        self.kind = kind  # staticmethod/classmethod the wrapper was stored in, if any
+
+
+class CacheCensus:
+    """
+    Finds functools.lru_cache wrappers in loaded modules and reports their
+    hit rates, plus the size of explicitly registered dict caches.
+
+    Module scans are incremental: each module is only walked the first time it
+    is seen, unless a full rescan is requested.
+    """
+
+    def __init__(self, dict_caches: Optional[Dict[str, Any]] = None):
+        self.dict_caches: Dict[str, Any] = dict(dict_caches or {})
+        self._lru_caches: Dict[str, _LruCacheRef] = {}
+        self._scanned_modules: Dict[str, int] = {}
+        self._previous: Dict[str, Tuple[int, int]] = {}
+        self._lock = threading.Lock()
+
+    def register_dict_cache(self, name: str, cache: Any) -> None:
+        """Include a dict-like cache in the census"""
+        self.dict_caches[name] = cache
+
+    def scan(self, full: bool = False) -> int:
+        """Look for lru_cache wrappers in modules not scanned yet; returns how many were found"""
+        found = 0
+        with self._lock:
+            if full:
+                self._scanned_modules.clear()
+            for module_name, module in list(sys.modules.items()):
+                if module is None or self._scanned_modules.get(module_name) == id(module):
+                    continue
+                self._scanned_modules[module_name] = id(module)
+                found += self._scan_namespace(module_name, module, module_name)
+        return found
+
+    def _scan_namespace(self, prefix: str, owner: Any, module_name: str) -> int:
+        found = 0
+        try:
+            namespace = dict(vars(owner))
+        except TypeError:
+            return 0
+
+        for attr, value in namespace.items():
+            kind = None
+            if isinstance(value, (staticmethod, classmethod)):
+                kind, value = type(value), value.__func__
+
+            if isinstance(value, _LRU_WRAPPER_TYPE):
+                name = f'{prefix}.{attr}'
+                if name not in self._lru_caches:
+                    found += 1
+                self._lru_caches[name] = _LruCacheRef(name, owner, attr, value, kind)
+            elif (isinstance(value, type) and owner is sys.modules.get(module_name) and
+                  getattr(value, '__module__', None) == module_name):
+                # Methods on classes defined in this module
+                found += self._scan_namespace(f'{prefix}.{attr}', value, module_name)
+        return found
+
+    def census(self, prefix: Optional[str] = None, full_scan: bool = False) -> Dict[str, Any]:
+        """
+        Report cache statistics
+
+        Args:
+            prefix: Only include lru caches whose qualified name starts with this
+            full_scan: Rescan every module instead of only new ones
+
+        Returns:
+            Dict with lru cache stats (including deltas since the previous
+            census) sorted by misses since then, and dict cache sizes
+        """
+        self.scan(full=full_scan)
+
+        lru_caches = []
+        for name, ref in sorted(self._lru_caches.items()):
+            if prefix and not name.startswith(prefix):
+                continue
+            info = ref.wrapper.cache_info()
+            calls = info.hits + info.misses
+            last_hits, last_misses = self._previous.get(name, (0, 0))
+            # cache_clear() or a resize resets the counters
+            if info.hits < last_hits or info.misses < last_misses:
+                last_hits, last_misses = 0, 0
+            delta_hits, delta_misses = info.hits - last_hits, info.misses - last_misses
+            delta_calls = delta_hits + delta_misses
+            self._previous[name] = (info.hits, info.misses)
+
+            lru_caches.append({
+                'name': name,
+                'hits': info.hits,
+                'misses': info.misses,
+                'maxsize': info.maxsize,
+                'currsize': info.currsize,
+                'hit_ratio': info.hits / calls if calls else None,
+                'delta_hits': delta_hits,
+                'delta_misses': delta_misses,
+                'delta_hit_ratio': delta_hits / delta_calls if delta_calls else None,
+            })
+        lru_caches.sort(key=lambda entry: entry['delta_misses'], reverse=True)
+
+        dict_caches = []
+        for name, cache in self.dict_caches.items():
+            entries = len(cache)
+            last_entries = self._previous.get(f'dict:{name}', (entries,))[0]
+            self._previous[f'dict:{name}'] = (entries,)
+            dict_caches.append({
+                'name': name,
+                'entries': entries,
+                'delta_entries': entries - last_entries,
+                'estimated_bytes': _estimate_size(cache),
+            })
+
+        return {
+            'lru_caches': lru_caches,
+            'dict_caches': dict_caches,
+            'scanned_modules': len(self._scanned_modules),
+        }
+
+    def _get(self, name: str) -> _LruCacheRef:
+        if name not in self._lru_caches:
+            self.scan()
+        if name not in self._lru_caches:
+            raise KeyError(f"Unknown lru cache: {name}")
+        return self._lru_caches[name]
+
+    def clear(self, name: str) -> None:
+        """Clear one lru cache or registered dict cache"""
+        if name in self.dict_caches:
+            self.dict_caches[name].clear()
+        else:
+            self._get(name).wrapper.cache_clear()
+
+    def resize(self, name: str, maxsize: Optional[int]) -> None:
+        """
+        Replace an lru cache with an empty one of a different maxsize
+
+        The new wrapper is set on the module or class the cache was found on;
+        references imported elsewhere (from module import func) keep the old one.
+        """
+        ref = self._get(name)
+        # cache_parameters() is 3.9+; on 3.8 typed can't be read back, so keep the default
+        cache_parameters = getattr(ref.wrapper, 'cache_parameters', None)
+        typed = cache_parameters()['typed'] if cache_parameters else False
+        wrapper = functools.lru_cache(maxsize=maxsize, typed=typed)(ref.wrapper.__wrapped__)
+        setattr(ref.owner, ref.attr, ref.kind(wrapper) if ref.kind else wrapper)
+        ref.wrapper = wrapper
+        self._previous.pop(name, None)
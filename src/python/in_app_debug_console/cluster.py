@@ -0,0 +1,374 @@
+import glob
+import json
+import os
+import socket
+import threading
+import time
+import traceback
+import uuid
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Optional, Callable, List, Union
+
+from .console_engine import ConsoleEngine, _Watchdog
+
+
+# Largest request/response line accepted on a worker socket
+MAX_MESSAGE_BYTES = 16 * 1024 * 1024
+
+
+class SessionOwnerUnavailable(Exception):
+    """Raised when the worker owning a session can no longer be reached"""
+    pass
+
+
+def _sum(values: List[Any]) -> Any:
+    return sum(v for v in values if isinstance(v, (int, float)) and not isinstance(v, bool))
+
+
+def _merge(values: List[Any]) -> Any:
+    """Merge dicts (summing numeric values per key) or concatenate lists"""
+    if all(isinstance(v, list) for v in values):
+        return [item for v in values for item in v]
+    merged: Dict[str, Any] = {}
+    for value in values:
+        if not isinstance(value, dict):
+            continue
+        for key, item in value.items():
+            current = merged.get(key)
+            if isinstance(current, (int, float)) and isinstance(item, (int, float)):
+                merged[key] = current + item
+            else:
+                merged[key] = item
+    return merged
+
+
+def _top(values: List[Any], n: int) -> Any:
+    merged = _merge(values)
+    if isinstance(merged, list):
+        return sorted(merged, reverse=True)[:n]
+    ranked = sorted(merged.items(), key=lambda kv: kv[1], reverse=True)
+    return dict(ranked[:n])
+
+
+REDUCERS: Dict[str, Callable[[List[Any], int], Any]] = {
+    'sum': lambda values, n: _sum(values),
+    'merge': lambda values, n: _merge(values),
+    'top': _top,
+}
+
+# Nodes created in this process; see post_fork()
+_nodes: 'weakref.WeakSet[ClusterNode]' = weakref.WeakSet()
+_autostart_pid: Optional[int] = None
+
+
+def post_fork(*args: Any) -> None:
+    """
+    Start every cluster node in a freshly forked worker.
+
+    Workers otherwise only join fan-out once they serve their first request.
+    Use as gunicorn's post_fork hook (extra arguments are ignored); nodes
+    created later in the same process start as soon as they are created.
+    """
+    global _autostart_pid
+    _autostart_pid = os.getpid()
+    for node in list(_nodes):
+        node.start()
+
+
+class ClusterNode:
+    """
+    Per-worker listener that lets any worker run console requests on all of
+    its siblings.
+
+    Every worker process binds a Unix domain socket named after its pid in a
+    shared run directory. The protocol is one JSON line per request and one
+    JSON line per response, so no external broker is involved.
+
+    Session IDs issued by new_session_id() encode the owning worker's pid so
+    follow-up commands landing on another worker can be routed back to it.
+    """
+
+    def __init__(self, console_engine: Union[ConsoleEngine, Callable[[], ConsoleEngine]],
+                 run_dir: str, session_id: str = 'cluster',
+                 forward_timeout: Optional[float] = None,
+                 commands: Optional[Dict[str, Callable]] = None):
+        # May be a callable so the engine is only built when first needed
+        self._console_engine = console_engine
+        self.run_dir = run_dir
+        self.session_id = session_id
+        self._forward_timeout = forward_timeout
+        self.commands: Dict[str, Callable] = dict(commands or {})
+        self._pid: Optional[int] = None
+        self._server: Optional[socket.socket] = None
+        self._lock = threading.Lock()
+
+        _nodes.add(self)
+        if _autostart_pid == os.getpid():
+            self.start()
+
+    @property
+    def console_engine(self) -> ConsoleEngine:
+        if not isinstance(self._console_engine, ConsoleEngine):
+            self._console_engine = self._console_engine()
+        return self._console_engine
+
+    @property
+    def forward_timeout(self) -> float:
+        """Deadline for one forwarded session request"""
+        if self._forward_timeout is not None:
+            return self._forward_timeout
+        return self.console_engine.timeout + 1.0
+
+    @property
+    def socket_path(self) -> str:
+        return self._socket_path(os.getpid())
+
+    def _socket_path(self, pid: int) -> str:
+        return os.path.join(self.run_dir, f'worker-{pid}.sock')
+
+    def register_command(self, name: str, func: Callable) -> None:
+        """Register a named command that fan-out requests can invoke"""
+        self.commands[name] = func
+
+    def start(self) -> None:
+        """Start listening in this process (safe to call on every request)"""
+        if self._pid == os.getpid():
+            return
+
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+
+            # Inherited from the pre-fork master; the socket path belongs to it
+            if self._server is not None:
+                self._server.close()
+                self._server = None
+
+            os.makedirs(self.run_dir, mode=0o700, exist_ok=True)
+            path = self.socket_path
+            if os.path.exists(path):
+                os.unlink(path)
+
+            server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            server.bind(path)
+            os.chmod(path, 0o600)
+            server.listen(64)
+
+            self._server = server
+            self._pid = os.getpid()
+            threading.Thread(target=self._serve, args=(server,),
+                             name='debug-console-cluster', daemon=True).start()
+
+    def stop(self) -> None:
+        """Stop listening and remove this worker's socket"""
+        with self._lock:
+            if self._server is None or self._pid != os.getpid():
+                return
+            self._server.close()
+            self._server = None
+            self._pid = None
+            try:
+                os.unlink(self.socket_path)
+            except FileNotFoundError:
+                pass
+
+    def _serve(self, server: socket.socket) -> None:
+        while True:
+            try:
+                conn, _ = server.accept()
+            except OSError:
+                return  # socket closed by stop()
+            threading.Thread(target=self._handle_connection, args=(conn,),
+                             daemon=True).start()
+
+    def _handle_connection(self, conn: socket.socket) -> None:
+        with conn, conn.makefile('rb') as reader:
+            try:
+                line = reader.readline(MAX_MESSAGE_BYTES)
+                response = self.handle(json.loads(line))
+            except Exception as e:
+                response = {'success': False, 'error': str(e), 'pid': os.getpid()}
+            try:
+                conn.sendall(json.dumps(response, default=str).encode() + b'\n')
+            except OSError:
+                pass  # requester gave up (deadline passed)
+
+    def handle(self, message: Dict[str, Any]) -> Dict[str, Any]:
+        """Run one cluster request against the local engine"""
+        start = time.perf_counter()
+        session_id = message.get('session_id') or self.session_id
+        op = message.get('op')
+
+        try:
+            if op == 'execute':
+                result = self.console_engine.execute(message['code'], session_id)
+            elif op == 'evaluate':
+                # Runs on a socket thread, where SIGALRM can't bound it
+                with _Watchdog(self.console_engine.timeout):
+                    result = self.console_engine.evaluate_expression(
+                        message['expression'], session_id, raw_value=True)
+            elif op == 'clear':
+                self.console_engine.clear_session(session_id)
+                result = {'success': True}
+            elif op == 'command':
+                name = message['command']
+                if name not in self.commands:
+                    raise KeyError(f"Unknown command: {name}")
+                with _Watchdog(self.console_engine.timeout):
+                    value = self.commands[name](*message.get('args', []))
+                result = {'success': True, 'value': value}
+            else:
+                raise ValueError(f"Unknown cluster operation: {op!r}")
+        except Exception as e:
+            result = {'success': False, 'error': str(e), 'traceback': traceback.format_exc()}
+
+        result['pid'] = os.getpid()
+        result['elapsed_ms'] = (time.perf_counter() - start) * 1000
+        return result
+
+    def new_session_id(self) -> str:
+        """Create a session ID owned by this worker"""
+        return f'w{os.getpid()}-{uuid.uuid4()}'
+
+    def owner_of(self, session_id: str) -> Optional[int]:
+        """Get the pid of the worker owning a session, if the ID encodes one"""
+        prefix, sep, _ = session_id.partition('-')
+        if not sep or not prefix.startswith('w') or not prefix[1:].isdigit():
+            return None
+        return int(prefix[1:])
+
+    def route(self, message: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Run a session request on the worker owning message['session_id']
+
+        Requests for local (or unowned) sessions run in-process; others are
+        forwarded over the owner's socket and the response is relayed. A
+        forward that fails while the owner is still alive (timeout, dropped
+        connection, unreadable reply) returns an error result.
+
+        Raises:
+            SessionOwnerUnavailable: If the owning worker has gone away
+        """
+        owner = self.owner_of(message['session_id'])
+        if owner is None or owner == os.getpid():
+            return self.handle(message)
+
+        sent = time.perf_counter()
+        try:
+            result = self.send(owner, message, self.forward_timeout)
+        except (FileNotFoundError, ConnectionRefusedError) as e:
+            raise SessionOwnerUnavailable(f"Worker {owner} owning the session is gone") from e
+        except socket.timeout:
+            return {
+                'success': False,
+                'error': f'Worker {owner} owning the session did not respond within {self.forward_timeout}s',
+                'pid': owner,
+            }
+        except (OSError, ValueError) as e:
+            # e.g. the owner died mid-request, reset the connection or sent an oversized reply
+            if not self._is_alive(owner):
+                raise SessionOwnerUnavailable(f"Worker {owner} owning the session is gone") from e
+            return {
+                'success': False,
+                'error': f'Forwarding to worker {owner} failed: {e}',
+                'pid': owner,
+            }
+        result['forwarded_by'] = os.getpid()
+        result['forward_ms'] = (time.perf_counter() - sent) * 1000
+        return result
+
+    def peers(self) -> List[int]:
+        """List the pids of all workers with a socket in the run directory"""
+        pids = []
+        for path in glob.glob(os.path.join(self.run_dir, 'worker-*.sock')):
+            try:
+                pids.append(int(os.path.basename(path)[len('worker-'):-len('.sock')]))
+            except ValueError:
+                continue
+        return sorted(pids)
+
+    def send(self, pid: int, message: Dict[str, Any], timeout: float) -> Dict[str, Any]:
+        """Send one request to a worker and wait for its response"""
+        path = self._socket_path(pid)
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(timeout)
+            try:
+                sock.connect(path)
+            except (FileNotFoundError, ConnectionRefusedError):
+                self._remove_if_stale(pid)
+                raise
+            sock.sendall(json.dumps(message, default=str).encode() + b'\n')
+            with sock.makefile('rb') as reader:
+                line = reader.readline(MAX_MESSAGE_BYTES)
+        if not line:
+            raise ConnectionError(f"Worker {pid} closed the connection")
+        return json.loads(line)
+
+    def _is_alive(self, pid: int) -> bool:
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            pass  # exists, owned by another user
+        return True
+
+    def _remove_if_stale(self, pid: int) -> None:
+        if not self._is_alive(pid):
+            try:
+                os.unlink(self._socket_path(pid))
+            except FileNotFoundError:
+                pass
+
+    def fan_out(self, message: Dict[str, Any], deadline: float = 5.0,
+                reducer: Optional[str] = None, top_n: int = 10) -> Dict[str, Any]:
+        """
+        Send a request to every worker in parallel and collect the results
+
+        Args:
+            message: Cluster request ({'op': 'execute'|'evaluate'|'command', ...})
+            deadline: Seconds to wait for all workers before giving up on stragglers
+            reducer: Optional name from REDUCERS applied to the workers' values
+            top_n: Number of entries kept by the 'top' reducer
+
+        Returns:
+            Dict with per-worker results and the reduced value
+        """
+        if reducer is not None and reducer not in REDUCERS:
+            raise ValueError(f"Unknown reducer: {reducer!r}")
+
+        self.start()
+        pids = self.peers()
+        expires_at = time.monotonic() + deadline
+
+        def call(pid: int) -> Dict[str, Any]:
+            sent = time.perf_counter()
+            try:
+                result = self.send(pid, message, max(expires_at - time.monotonic(), 0.001))
+            except socket.timeout:
+                result = {'success': False, 'error': f'Deadline of {deadline}s exceeded', 'pid': pid}
+            except Exception as e:
+                result = {'success': False, 'error': str(e), 'pid': pid}
+            result['roundtrip_ms'] = (time.perf_counter() - sent) * 1000
+            return result
+
+        workers: List[Dict[str, Any]] = []
+        if pids:
+            with ThreadPoolExecutor(max_workers=len(pids)) as pool:
+                workers = list(pool.map(call, pids))
+
+        response = {
+            'success': all(w.get('success') for w in workers),
+            'workers': workers,
+            'worker_count': len(workers),
+        }
+        if reducer is not None:
+            values = [w['value'] for w in workers if w.get('success') and 'value' in w]
+            response['reducer'] = reducer
+            try:
+                response['reduced'] = REDUCERS[reducer](values, top_n)
+            except Exception as e:
+                # e.g. 'top' over values that can't be compared; keep the per-worker results
+                response['reduce_error'] = f'{type(e).__name__}: {e}'
+        return response
@@ -1,12 +1,127 @@
+import ast
+import builtins
 import code
+import ctypes
+import datetime
+import json
+import math
+import re
 import sys
 import io
 import traceback
 import signal
 import threading
 import time
-from contextlib import redirect_stdout, redirect_stderr
-from typing import Dict, Any, Optional, Callable
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Dict, Any, Optional, Callable, Tuple, Hashable
+
+from .metrics import MetricsRegistry
+from .result_cache import ResultCache
+
+if TYPE_CHECKING:
+    from .artifacts import ArtifactStore, SpooledOutput
+
+
+# Modules every session namespace starts with
+_SHARED_MODULES = {'math': math, 'json': json, 'datetime': datetime, 're': re}
+
+
+# Per-thread capture targets; see _captured_output()
+_capture = threading.local()
+_install_lock = threading.Lock()
+_fallback_excepthook = sys.excepthook
+_fallback_displayhook = sys.displayhook
+
+
+class _ThreadRoutedStream:
+    """
+    Stand-in for sys.stdout/sys.stderr that sends writes from a capturing
+    thread to that thread's buffer and everything else to the real stream.
+    
+    Swapping sys.stdout per execution (contextlib.redirect_stdout) is
+    process-wide, so concurrent executions would capture each other's output
+    and could leave sys.stdout pointing at a discarded buffer.
+    
+    Deliberately not an io.TextIOBase subclass: that would shadow encoding,
+    errors, fileno(), isatty() and friends with stubs instead of forwarding
+    them, breaking logging, faulthandler and subprocess code in the host app.
+    """
+    
+    def __init__(self, name: str, fallback):
+        self._name = name
+        self._fallback = fallback
+    
+    def _target(self):
+        target = getattr(_capture, self._name, None)
+        return target if target is not None else self._fallback
+    
+    def write(self, text: str) -> int:
+        return self._target().write(text)
+    
+    def writelines(self, lines) -> None:
+        self._target().writelines(lines)
+    
+    def flush(self) -> None:
+        self._target().flush()
+    
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._target(), name)
+
+
+def _routed_excepthook(exc_type, exc_value, exc_traceback):
+    handler = getattr(_capture, 'excepthook', None)
+    (handler or _fallback_excepthook)(exc_type, exc_value, exc_traceback)
+
+
+def _routed_displayhook(value):
+    handler = getattr(_capture, 'displayhook', None)
+    (handler or _fallback_displayhook)(value)
+
+
+def _install_output_routing() -> None:
+    """Install the thread-routing stdout/stderr/excepthook/displayhook (re-done if replaced)"""
+    global _fallback_excepthook, _fallback_displayhook
+    with _install_lock:
+        for name in ('stdout', 'stderr'):
+            current = getattr(sys, name)
+            if not isinstance(current, _ThreadRoutedStream):
+                setattr(sys, name, _ThreadRoutedStream(name, current))
+        if sys.excepthook is not _routed_excepthook:
+            _fallback_excepthook = sys.excepthook
+            sys.excepthook = _routed_excepthook
+        if sys.displayhook is not _routed_displayhook:
+            _fallback_displayhook = sys.displayhook
+            sys.displayhook = _routed_displayhook
+
+
+@contextmanager
+def _captured_output(stdout, stderr, excepthook, displayhook=None):
+    """Capture this thread's output and unhandled exceptions (and displayed values, if given)"""
+    if not (isinstance(sys.stdout, _ThreadRoutedStream) and
+            isinstance(sys.stderr, _ThreadRoutedStream) and
+            sys.excepthook is _routed_excepthook and
+            sys.displayhook is _routed_displayhook):
+        _install_output_routing()
+    _capture.stdout, _capture.stderr, _capture.excepthook = stdout, stderr, excepthook
+    _capture.displayhook = displayhook
+    try:
+        yield
+    finally:
+        _capture.stdout = _capture.stderr = _capture.excepthook = _capture.displayhook = None
+
+
+class _CallbackStringIO(io.StringIO):
+    """StringIO that also hands every write to a callback (for streaming output)"""
+    
+    def __init__(self, callback: Callable[[str], None]):
+        super().__init__()
+        self._callback = callback
+    
+    def write(self, text: str) -> int:
+        written = super().write(text)
+        if text:
+            self._callback(text)
+        return written
 
 
 class TimeoutError(Exception):
@@ -14,61 +129,219 @@ class TimeoutError(Exception):
     pass
 
 
+class _ThreadTimeout(TimeoutError):
+    """Raised in a thread by _Watchdog once its deadline passes"""
+    
+    def __init__(self, message: str = 'Code execution timed out'):
+        super().__init__(message)
+
+
+def _set_async_exc(thread_id: int, exc_type: Optional[type]) -> None:
+    """Raise exc_type in another thread at its next bytecode (None clears it)"""
+    ctypes.pythonapi.PyThreadState_SetAsyncExc(
+        ctypes.c_ulong(thread_id), ctypes.py_object(exc_type) if exc_type else None
+    )
+
+
+class _Watchdog:
+    """
+    Timeout for threads other than the main one, where SIGALRM can't be used
+    (request threads, cluster sockets). Raises _ThreadTimeout in the thread
+    that started it if it is still running when the timer fires; code blocked
+    inside a C call is interrupted once that call returns.
+    """
+    
+    def __init__(self, timeout: float):
+        self._thread_id = threading.get_ident()
+        self._lock = threading.Lock()
+        self._armed = False
+        self._timer = threading.Timer(timeout, self._fire)
+        self._timer.daemon = True
+    
+    def start(self) -> None:
+        self._armed = True
+        self._timer.start()
+    
+    def cancel(self) -> None:
+        with self._lock:
+            self._timer.cancel()
+            if self._armed:
+                self._armed = False
+                # Drop an interrupt that fired just as the code finished
+                _set_async_exc(self._thread_id, None)
+    
+    def _fire(self) -> None:
+        with self._lock:
+            if self._armed:
+                _set_async_exc(self._thread_id, _ThreadTimeout)
+    
+    def __enter__(self) -> '_Watchdog':
+        self.start()
+        return self
+    
+    def __exit__(self, *exc_info) -> None:
+        self.cancel()
+
+
 class ConsoleEngine:
     """Core execution engine for Python debug console"""
     
     def __init__(self, timeout: int = 5, max_output_length: int = 10000, 
-                 exposed_globals: Optional[Dict[str, Any]] = None):
+                 exposed_globals: Optional[Dict[str, Any]] = None,
+                 result_cache_size: int = 0, result_cache_ttl: float = 2.0,
+                 artifact_store: Optional['ArtifactStore'] = None):
         self.timeout = timeout
         self.max_output_length = max_output_length
         self.sessions: Dict[str, code.InteractiveConsole] = {}
         self.exposed_globals = exposed_globals or {}
         
+        # Results longer than max_output_length spill here instead of being truncated
+        self.artifact_store = artifact_store
+        
+        # Opt-in cache for evaluate_expression; disabled when size is 0
+        self.result_cache = (ResultCache(result_cache_size, result_cache_ttl)
+                             if result_cache_size > 0 else None)
+        self._expression_ttls: Dict[str, float] = {}
+        self._namespace_version = 0
+        # Bumped by every execution so per-session results never outlive an assignment
+        self._session_versions: Dict[str, int] = {}
+        
+        # Built on the first session and copied for every later one
+        self._namespace_template: Optional[Dict[str, Any]] = None
+        
+        self.metrics = self._create_metrics()
+        
     def get_session(self, session_id: str) -> code.InteractiveConsole:
         """Get or create a console session"""
         if session_id not in self.sessions:
-            # Create safe globals dict
-            safe_globals = self._create_safe_globals()
+            if self._namespace_template is None:
+                self._namespace_template = self._create_safe_globals()
+            
+            # Copy the template; builtins get their own dict so sessions can't affect each other
+            safe_globals = dict(self._namespace_template)
+            safe_globals['__builtins__'] = dict(self._namespace_template['__builtins__'])
             safe_globals.update(self.exposed_globals)
             
             # Create InteractiveConsole with safe globals
             console = code.InteractiveConsole(locals=safe_globals)
             self.sessions[session_id] = console
+            self._sessions_created.inc()
             
         return self.sessions[session_id]
     
-    def execute(self, code_string: str, session_id: str) -> Dict[str, Any]:
-        """Execute code in a session context"""
+    def _create_metrics(self) -> MetricsRegistry:
+        """Register the engine's preaggregated metrics"""
+        registry = MetricsRegistry()
+        self._executions = registry.counter(
+            'debug_console_executions_total', 'Code executions by outcome', ['status'])
+        self._execution_duration = registry.histogram(
+            'debug_console_execution_duration_seconds', 'Time spent executing code')
+        self._timeouts = registry.counter(
+            'debug_console_execution_timeouts_total', 'Executions stopped by the timeout')
+        self._truncations = registry.counter(
+            'debug_console_output_truncations_total', 'Results whose output was truncated')
+        self._evaluations = registry.counter(
+            'debug_console_evaluations_total', 'Expression evaluations by outcome', ['status'])
+        self._sessions_created = registry.counter(
+            'debug_console_sessions_created_total', 'Console sessions created')
+        self._sessions_evicted = registry.counter(
+            'debug_console_sessions_evicted_total', 'Console sessions cleared')
+        registry.gauge_func(
+            'debug_console_sessions', 'Live console sessions', lambda: len(self.sessions))
+        
+        if self.result_cache:
+            cache = self.result_cache
+            registry.counter_func('debug_console_result_cache_hits_total', 'Result cache hits',
+                                  lambda: cache.hits)
+            registry.counter_func('debug_console_result_cache_misses_total', 'Result cache misses',
+                                  lambda: cache.misses)
+            registry.counter_func('debug_console_result_cache_coalesced_total',
+                                  'Lookups that waited for an identical in-flight evaluation',
+                                  lambda: cache.coalesced)
+            registry.counter_func('debug_console_result_cache_evictions_total', 'Result cache LRU evictions',
+                                  lambda: cache.evictions)
+        
+        if self.artifact_store:
+            store = self.artifact_store
+            self._artifacts = registry.counter(
+                'debug_console_artifacts_total', 'Results spilled to disk artifacts')
+            registry.gauge_func('debug_console_artifact_bytes', 'Bytes held in the artifact directory',
+                                lambda: store.total_bytes)
+            registry.counter_func('debug_console_artifacts_collected_total',
+                                  'Artifacts removed for age or the size quota', lambda: store.collected)
+        return registry
+    
+    def execute(self, code_string: str, session_id: str,
+                output_callback: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
+        """
+        Execute code in a session context
+        
+        output_callback, if given, receives output chunks as they are written
+        (from the executing thread) in addition to the captured result.
+        """
+        start = time.perf_counter()
+        try:
+            result = self._execute(code_string, session_id, output_callback)
+        finally:
+            self._session_versions[session_id] = self._session_versions.get(session_id, 0) + 1
+        self._execution_duration.observe(time.perf_counter() - start)
+        
+        if result.get('needs_more'):
+            status = 'incomplete'
+        else:
+            status = 'success' if result.get('success') else 'error'
+        self._executions.inc(status)
+        return result
+    
+    def _execute(self, code_string: str, session_id: str,
+                 output_callback: Optional[Callable[[str], None]]) -> Dict[str, Any]:
         console = self.get_session(session_id)
         
         # Capture output
-        stdout_capture = io.StringIO()
-        stderr_capture = io.StringIO()
+        spool = None
+        if self.artifact_store:
+            from .artifacts import SpooledOutput
+            # One buffer for both streams so the artifact keeps their interleaving
+            spool = SpooledOutput(self.artifact_store, self.max_output_length, output_callback)
+            stdout_capture = stderr_capture = spool
+        elif output_callback:
+            stdout_capture = _CallbackStringIO(output_callback)
+            stderr_capture = _CallbackStringIO(output_callback)
+        else:
+            stdout_capture = io.StringIO()
+            stderr_capture = io.StringIO()
         
-        # Store original exception handler
-        original_excepthook = sys.excepthook
         exception_info = {}
         
         def exception_handler(exc_type, exc_value, exc_traceback):
+            # Timeouts raised inside user code are caught by runcode() and land here
+            if issubclass(exc_type, TimeoutError):
+                self._timeouts.inc()
             exception_info['type'] = exc_type.__name__
             exception_info['value'] = str(exc_value)
             exception_info['traceback'] = ''.join(
                 traceback.format_exception(exc_type, exc_value, exc_traceback)
             )
         
+        # SIGALRM handlers can only be installed from the main thread
+        use_alarm = (hasattr(signal, 'SIGALRM') and
+                     threading.current_thread() is threading.main_thread())
+        watchdog = None if use_alarm else _Watchdog(self.timeout)
+        
         try:
             # Set up timeout if supported (Unix-like systems)
-            if hasattr(signal, 'SIGALRM'):
+            if use_alarm:
                 def timeout_handler(signum, frame):
                     raise TimeoutError(f"Code execution timed out after {self.timeout} seconds")
                 
                 signal.signal(signal.SIGALRM, timeout_handler)
                 signal.alarm(self.timeout)
+            else:
+                watchdog.start()
             
             # Redirect output and execute code
-            sys.excepthook = exception_handler
-            
-            with redirect_stdout(stdout_capture), redirect_stderr(stderr_capture):
+            displayhook = self._spooling_displayhook(spool, console) if spool is not None else None
+            with _captured_output(stdout_capture, stderr_capture, exception_handler, displayhook):
                 # Check if code is complete
                 try:
                     compile(code_string, '<string>', 'exec')
@@ -91,55 +364,47 @@ class ConsoleEngine:
                         'needs_more': True
                     }
             
-            # Get captured output
-            stdout_content = stdout_capture.getvalue()
-            stderr_content = stderr_capture.getvalue()
-            combined_output = stdout_content + stderr_content
-            
             # Check for exceptions
             if exception_info:
                 return {
                     'success': False,
                     'error': exception_info.get('value', 'Unknown error'),
                     'traceback': exception_info.get('traceback', ''),
-                    'output': self._truncate_output(combined_output)
+                    **self._collect_output(spool, stdout_capture, stderr_capture)
                 }
             
             return {
                 'success': True,
-                'output': self._truncate_output(combined_output),
+                **self._collect_output(spool, stdout_capture, stderr_capture),
                 'needs_more': False
             }
             
         except TimeoutError as e:
+            # Fired outside user code (e.g. while compiling)
+            self._timeouts.inc()
             return {
                 'success': False,
                 'error': str(e),
-                'output': self._truncate_output(stdout_capture.getvalue() + stderr_capture.getvalue())
+                **self._collect_output(spool, stdout_capture, stderr_capture)
             }
         except Exception as e:
             return {
                 'success': False,
                 'error': str(e),
                 'traceback': traceback.format_exc(),
-                'output': self._truncate_output(stdout_capture.getvalue() + stderr_capture.getvalue())
+                **self._collect_output(spool, stdout_capture, stderr_capture)
             }
         finally:
-            # Restore original exception handler
-            sys.excepthook = original_excepthook
-            
             # Cancel timeout if it was set
-            if hasattr(signal, 'SIGALRM'):
+            if use_alarm:
                 signal.alarm(0)
+            else:
+                watchdog.cancel()
+            if spool is not None:
+                spool.finish()
     
     def _create_safe_globals(self) -> Dict[str, Any]:
         """Create a dictionary of safe global variables for the console"""
-        import builtins
-        import math
-        import json
-        import datetime
-        import re
-        
         # Start with safe builtins
         safe_builtins = {
             'abs', 'all', 'any', 'bin', 'bool', 'chr', 'dict', 'dir', 'divmod',
@@ -153,10 +418,7 @@ class ConsoleEngine:
         # Create safe globals dict
         safe_globals = {
             '__builtins__': {name: getattr(builtins, name) for name in safe_builtins},
-            'math': math,
-            'json': json,
-            'datetime': datetime,
-            're': re,
+            **_SHARED_MODULES,
         }
         
         return safe_globals
@@ -164,51 +426,206 @@ class ConsoleEngine:
     def _truncate_output(self, output: str) -> str:
         """Truncate output if it's too long"""
         if len(output) > self.max_output_length:
+            self._truncations.inc()
             return (output[:self.max_output_length] + 
                    f"\n... (output truncated, {len(output) - self.max_output_length} characters omitted)")
         return output
     
+    def _collect_output(self, spool: Optional['SpooledOutput'], stdout_capture, stderr_capture) -> Dict[str, Any]:
+        """Result fields for captured output: truncated, or its head plus the spilled artifact"""
+        if spool is None:
+            return {'output': self._truncate_output(stdout_capture.getvalue() + stderr_capture.getvalue())}
+        return self._spilled_fields('output', spool)
+    
+    def _spilled_fields(self, field: str, spool: 'SpooledOutput') -> Dict[str, Any]:
+        head, artifact = spool.finish()
+        if artifact is None:
+            return {field: head}
+        self._artifacts.inc()
+        omitted = spool.length - len(head)
+        return {
+            field: head + f"\n... ({omitted} characters omitted; full {field} in artifact {artifact['id']})",
+            'artifact': artifact
+        }
+    
     def clear_session(self, session_id: str) -> None:
         """Clear a console session"""
         if session_id in self.sessions:
             del self.sessions[session_id]
+            self._sessions_evicted.inc()
+        self._session_versions.pop(session_id, None)
+        if self.result_cache:
+            # Keys start (expression, namespace version, scope); drop this session's results
+            self.result_cache.discard_where(lambda key: key[2] == session_id)
     
     def get_stats(self) -> Dict[str, Any]:
         """Get session statistics"""
-        return {
+        stats = {
             'active_sessions': len(self.sessions),
             'session_ids': list(self.sessions.keys())
         }
+        if self.result_cache:
+            stats['result_cache'] = self.result_cache.get_stats()
+        if self.artifact_store:
+            stats['artifacts'] = self.artifact_store.get_stats()
+        return stats
     
     def expose_global(self, name: str, value: Any) -> None:
         """Expose a global variable/object to all sessions"""
         self.exposed_globals[name] = value
+        self._namespace_version += 1
         
         # Update existing sessions
         for console in self.sessions.values():
             console.locals[name] = value
     
-    def evaluate_expression(self, expression: str, session_id: str) -> Dict[str, Any]:
-        """Evaluate a single expression and return its value"""
+    def evaluate_expression(self, expression: str, session_id: str,
+                            cache_ttl: Optional[float] = None,
+                            raw_value: bool = False) -> Dict[str, Any]:
+        """
+        Evaluate a single expression and return its value
+        
+        With raw_value, a JSON-serializable value is returned as-is instead of
+        formatted (unless it spilled to an artifact), e.g. for cluster reducers.
+        """
         console = self.get_session(session_id)
         
+        if self.result_cache:
+            key = self._result_cache_key(expression, console, session_id)
+            if key is not None:
+                if cache_ttl is None:
+                    cache_ttl = self._expression_ttls.get(key[0])
+                if raw_value:
+                    key += ('raw',)
+                return self.result_cache.get_or_compute(
+                    key, lambda: self._evaluate(expression, console, raw_value), cache_ttl
+                )
+        
+        return self._evaluate(expression, console, raw_value)
+    
+    def set_expression_ttl(self, expression: str, ttl: float) -> None:
+        """Override the result cache TTL for results of one expression stored from now on"""
+        self._expression_ttls[self._normalize_expression(expression)] = ttl
+    
+    def _normalize_expression(self, expression: str) -> str:
+        """Normalize an expression so formatting differences share a cache entry"""
+        return ast.dump(ast.parse(expression.strip(), mode='eval'))
+    
+    def _result_cache_key(self, expression: str, console: code.InteractiveConsole,
+                          session_id: str) -> Optional[Tuple[Hashable, ...]]:
+        """
+        Build the result cache key for an expression.
+        
+        Expressions that only read exposed globals, the default modules and
+        builtins are shared across sessions; anything touching session-defined
+        names or binding a name (comprehension, lambda, walrus) is cached per
+        session, keyed on the session's execution count so results computed
+        before the session last ran code are never served. Returns None if the
+        expression can't be parsed.
+        """
+        try:
+            tree = ast.parse(expression.strip(), mode='eval')
+        except SyntaxError:
+            return None
+        
+        loaded, binds_names = set(), False
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Name):
+                if isinstance(node.ctx, ast.Load):
+                    loaded.add(node.id)
+                else:
+                    binds_names = True
+            elif isinstance(node, ast.arguments):
+                binds_names = True
+        
+        # A bound name can shadow a session global in one place and read it in
+        # another ([x for x in data] + [x]), so don't try to tell those apart
+        if binds_names:
+            return (ast.dump(tree), self._namespace_version, session_id,
+                    self._session_versions.get(session_id, 0))
+        
+        missing = object()
+        session_builtins = console.locals.get('__builtins__', {})
+        for name in loaded:
+            if name in self.exposed_globals:
+                shared = self.exposed_globals[name]
+            elif name in _SHARED_MODULES:
+                shared = _SHARED_MODULES[name]
+            else:
+                shared = getattr(builtins, name, missing)
+            current = console.locals.get(name, session_builtins.get(name, missing))
+            if current is missing or current is not shared:
+                return (ast.dump(tree), self._namespace_version, session_id,
+                        self._session_versions.get(session_id, 0))
+        
+        return (ast.dump(tree), self._namespace_version, None)
+    
+    def _evaluate(self, expression: str, console: code.InteractiveConsole,
+                  raw_value: bool = False) -> Dict[str, Any]:
+        """Evaluate an expression against a session namespace"""
         try:
             # Compile as eval to get the result
             compiled = compile(expression, '<expression>', 'eval')
             result = eval(compiled, console.locals)
             
+            self._evaluations.inc('success')
+            fields = self._value_fields(result)
+            if raw_value and 'artifact' not in fields:
+                try:
+                    json.dumps(result)
+                    fields['value'] = result
+                except (TypeError, ValueError):
+                    pass
             return {
                 'success': True,
-                'value': self._format_value(result),
+                **fields,
                 'type': type(result).__name__
             }
         except Exception as e:
+            self._evaluations.inc('error')
             return {
                 'success': False,
                 'error': str(e),
                 'traceback': traceback.format_exc()
             }
     
+    def _spooling_displayhook(self, spool: 'SpooledOutput',
+                              console: code.InteractiveConsole) -> Callable[[Any], None]:
+        """
+        Displayhook writing a value's repr straight into the spool, container
+        items one at a time, instead of building one string for the whole value
+        """
+        from .artifacts import iter_str
+        
+        def displayhook(value: Any) -> None:
+            if value is None:
+                return
+            for chunk in iter_str(value, fallback=repr):
+                spool.write(chunk)
+            spool.write('\n')
+            console.locals['__builtins__']['_'] = value
+        
+        return displayhook
+    
+    def _value_fields(self, value: Any) -> Dict[str, Any]:
+        """Result fields for an evaluated value, spilling it to an artifact when it's too long"""
+        if self.artifact_store is None:
+            return {'value': self._format_value(value)}
+        
+        from .artifacts import SpooledOutput, iter_str
+        spool = SpooledOutput(self.artifact_store, self.max_output_length)
+        try:
+            if value is None or isinstance(value, str) or callable(value):
+                spool.write(self._format_value(value))
+            else:
+                # Containers are formatted item by item straight into the spool
+                for chunk in iter_str(value):
+                    spool.write(chunk)
+        except Exception:
+            spool.finish()
+            return {'value': f"<{type(value).__name__} object>"}
+        return self._spilled_fields('value', spool)
+    
     def _format_value(self, value: Any) -> str:
         """Format a value for display"""
         if value is None:
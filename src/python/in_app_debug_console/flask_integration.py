@@ -1,10 +1,21 @@
 import os
+import hashlib
 import logging
-from typing import Callable, Optional, Dict, Any
-from flask import Blueprint, request, jsonify, render_template_string, session, current_app
+import threading
+import time
+from typing import TYPE_CHECKING, Callable, Optional, Dict, Any
+from flask import Blueprint, request, jsonify, render_template_string, session, current_app, g, send_file
 from werkzeug.exceptions import Forbidden
 
-from .console_engine import ConsoleEngine
+from .metrics import MetricsRegistry
+
+if TYPE_CHECKING:
+    from .console_engine import ConsoleEngine
+    from .cluster import ClusterNode
+    from .audit import AuditLog
+    from .request_capture import RequestCapture
+    from .cache_census import CacheCensus
+    from .artifacts import ArtifactStore
 
 
 # HTML template for the console UI
@@ -184,10 +195,16 @@ CONSOLE_HTML = """
 
                 const result = await response.json();
                 
+                if (result.session_reset) {
+                    appendToOutput(`<span class="error">Previous session was lost (worker restarted); started a new one</span>`);
+                }
                 if (result.success) {
                     if (result.output) {
                         appendToOutput(`<span class="success">${escapeHtml(result.output)}</span>`);
                     }
+                    if (result.artifact) {
+                        appendToOutput(`<a class="prompt" href="{{ url_for('console.console_page') }}artifacts/${result.artifact.id}">Download full output (${result.artifact.bytes} bytes)</a>`);
+                    }
                     if (result.needs_more) {
                         appendToOutput(`<span class="prompt">... </span>`);
                     } else {
@@ -237,22 +254,98 @@ CONSOLE_HTML = """
 
 
 class ConsoleBlueprint:
-    """Flask blueprint for the debug console"""
+    """
+    Flask blueprint for the debug console
+    
+    Without an explicit console_engine, the engine is built by engine_factory
+    on the first authorized console request rather than at import time.
+    """
     
     def __init__(self, name: str = 'console', url_prefix: str = '/__console__',
                  auth_func: Optional[Callable] = None, 
-                 console_engine: Optional[ConsoleEngine] = None,
-                 enable_logging: bool = True):
+                 console_engine: Optional['ConsoleEngine'] = None,
+                 enable_logging: bool = True,
+                 cluster: Optional['ClusterNode'] = None,
+                 audit_log: Optional['AuditLog'] = None,
+                 user_func: Optional[Callable] = None,
+                 engine_factory: Optional[Callable[[], 'ConsoleEngine']] = None,
+                 request_capture: Optional['RequestCapture'] = None,
+                 cache_census: Optional['CacheCensus'] = None,
+                 artifact_store: Optional['ArtifactStore'] = None):
         self.name = name
         self.url_prefix = url_prefix
         self.auth_func = auth_func
-        self.console_engine = console_engine or ConsoleEngine()
+        self._console_engine = console_engine
+        self._engine_factory = engine_factory
+        self._engine_lock = threading.Lock()
         self.enable_logging = enable_logging
+        self.cluster = cluster
+        self.audit_log = audit_log
+        self.user_func = user_func
+        self.request_capture = request_capture
+        self._cache_census = cache_census
+        self.artifact_store = artifact_store
+        self.metrics = self._create_metrics()
+        if console_engine is not None:
+            self._prepare_engine(console_engine)
         self.blueprint = self._create_blueprint()
         
         if enable_logging:
             self.logger = logging.getLogger(f'debug_console.{name}')
     
+    @property
+    def console_engine(self) -> 'ConsoleEngine':
+        """The console engine, built on first use"""
+        if self._console_engine is None:
+            with self._engine_lock:
+                if self._console_engine is None:
+                    if self._engine_factory is None:
+                        from .console_engine import ConsoleEngine
+                        self._engine_factory = ConsoleEngine
+                    self._console_engine = self._prepare_engine(self._engine_factory())
+        return self._console_engine
+    
+    @property
+    def cache_census(self) -> 'CacheCensus':
+        """The cache census, built on first use"""
+        if self._cache_census is None:
+            from .cache_census import CacheCensus
+            self._cache_census = CacheCensus()
+        return self._cache_census
+    
+    def _create_metrics(self) -> MetricsRegistry:
+        """Register blueprint-level metrics; engine metrics live on the engine"""
+        registry = MetricsRegistry()
+        self._console_request_duration = registry.histogram(
+            'debug_console_api_request_duration_seconds',
+            'Latency of authorized console endpoint requests', labelnames=['endpoint'])
+        
+        if self.request_capture:
+            self._app_request_duration = registry.histogram(
+                'debug_console_app_request_duration_seconds',
+                'Latency of captured host-app requests', labelnames=['method', 'status'])
+            registry.gauge_func('debug_console_captured_requests', 'Requests held in the capture buffer',
+                                lambda: len(self.request_capture._buffer))
+        
+        if self.audit_log:
+            audit_log = self.audit_log
+            registry.gauge_func('debug_console_audit_queue_depth', 'Audit events waiting to be written',
+                                lambda: audit_log._queue.qsize())
+            registry.counter_func('debug_console_audit_events_total', 'Audit events recorded',
+                                  lambda: audit_log.recorded)
+            registry.counter_func('debug_console_audit_dropped_total', 'Audit events dropped on a full queue',
+                                  lambda: audit_log.dropped)
+            registry.counter_func('debug_console_audit_write_errors_total', 'Failed audit batch writes',
+                                  lambda: audit_log.write_errors)
+        return registry
+    
+    def _prepare_engine(self, engine: 'ConsoleEngine') -> 'ConsoleEngine':
+        """Expose the blueprint's helpers to console sessions"""
+        engine.expose_global('cache_census', self.cache_census)
+        if self.request_capture:
+            engine.expose_global('request_capture', self.request_capture)
+        return engine
+    
     def _create_blueprint(self) -> Blueprint:
         """Create the Flask blueprint"""
         bp = Blueprint(self.name, __name__, url_prefix=self.url_prefix)
@@ -262,6 +355,66 @@ class ConsoleBlueprint:
             """Check authentication before allowing access"""
             if self.auth_func and not self.auth_func():
                 raise Forbidden("Access denied to debug console")
+            g.debug_console_api_start = time.perf_counter()
+        
+        @bp.after_request
+        def observe_latency(response):
+            """Record console endpoint latency"""
+            start = g.get('debug_console_api_start')
+            if start is not None:
+                endpoint = (request.endpoint or '').rpartition('.')[2]
+                self._console_request_duration.observe(time.perf_counter() - start, endpoint)
+            return response
+        
+        if self.cluster:
+            @bp.before_app_request
+            def start_cluster_node():
+                """Make sure this worker is reachable by its siblings"""
+                self.cluster.start()
+        
+        if self.request_capture:
+            from .request_capture import REPLAY_ENVIRON_KEY
+            
+            @bp.before_app_request
+            def start_request_timer():
+                """Time host-app requests and keep their body for the capture buffer"""
+                g.debug_console_request_start = time.perf_counter()
+                if request.blueprint == self.name or request.environ.get(REPLAY_ENVIRON_KEY):
+                    return
+                
+                # Read now: once the view parses request.form the body is consumed.
+                # Chunked bodies have no length to check against the cap, so skip them.
+                content_length = request.content_length
+                chunked = 'chunked' in request.headers.get('Transfer-Encoding', '').lower()
+                if chunked or (content_length or 0) > self.request_capture.max_body_bytes:
+                    g.debug_console_request_body = None
+                else:
+                    g.debug_console_request_body = request.get_data(cache=True) if content_length else b''
+            
+            @bp.after_app_request
+            def capture_request(response):
+                """Store the finished request in the capture buffer"""
+                start = g.get('debug_console_request_start')
+                if (start is None or request.blueprint == self.name or
+                        request.environ.get(REPLAY_ENVIRON_KEY)):
+                    return response
+                
+                duration = time.perf_counter() - start
+                self._app_request_duration.observe(
+                    duration, request.method, f'{response.status_code // 100}xx')
+                
+                body = g.get('debug_console_request_body')
+                self.request_capture.record(
+                    method=request.method,
+                    path=request.path,
+                    query_string=request.query_string,
+                    headers=request.headers.items(),
+                    body=body,
+                    status=response.status_code,
+                    duration_ms=duration * 1000,
+                    body_truncated=body is None
+                )
+                return response
         
         @bp.route('/', methods=['GET'])
         def console_page():
@@ -292,16 +445,36 @@ class ConsoleBlueprint:
             
             session_id = self._get_session_id()
             
-            if self.enable_logging:
-                self.logger.info(f"Executing code in session {session_id}: {repr(code[:100])}")
+            # The audit log replaces the per-execution log lines when configured
+            log_execution = self.enable_logging and self.audit_log is None
+            if log_execution:
+                self.logger.info("Executing code in session %s: %r", session_id, code[:100])
             
             # Execute the code
-            result = self.console_engine.execute(code, session_id)
+            start = time.perf_counter()
+            result = self._run_in_session({'op': 'execute', 'code': code}, session_id)
+            duration_ms = (time.perf_counter() - start) * 1000
             
-            if self.enable_logging:
-                self.logger.info(f"Execution result for session {session_id}: success={result.get('success')}")
+            if log_execution:
+                self.logger.info("Execution result for session %s: success=%s",
+                                 session_id, result.get('success'))
                 if not result.get('success'):
-                    self.logger.warning(f"Execution error: {result.get('error')}")
+                    self.logger.warning("Execution error: %s", result.get('error'))
+            
+            # The full output when it spilled; otherwise what the caller received
+            artifact = result.get('artifact')
+            output_bytes = (artifact['bytes'] if artifact else
+                            len((result.get('output') or '').encode('utf-8', 'replace')))
+            self._audit(
+                'execute',
+                session_id=result.get('session_id', session_id),
+                code=code,
+                code_sha256=hashlib.sha256(code.encode()).hexdigest(),
+                duration_ms=duration_ms,
+                success=bool(result.get('success')),
+                error=result.get('error'),
+                output_bytes=output_bytes,
+            )
             
             return jsonify(result)
         
@@ -310,24 +483,255 @@ class ConsoleBlueprint:
             """Get console statistics"""
             return jsonify(self.console_engine.get_stats())
         
+        @bp.route('/metrics', methods=['GET'])
+        def metrics():
+            """Console and instrumentation metrics in the Prometheus text format"""
+            # A scrape shouldn't build the engine; its series appear once the console is used
+            if self._console_engine is None:
+                body = self.metrics.render()
+            else:
+                body = self._console_engine.metrics.render([self.metrics])
+            return current_app.response_class(body, content_type=MetricsRegistry.CONTENT_TYPE)
+        
         @bp.route('/clear/<session_id>', methods=['POST'])
         def clear_session(session_id: str):
             """Clear a specific session"""
-            self.console_engine.clear_session(session_id)
+            if self.cluster:
+                from .cluster import SessionOwnerUnavailable
+                try:
+                    result = self.cluster.route({'op': 'clear', 'session_id': session_id})
+                except SessionOwnerUnavailable:
+                    result = {'success': True}  # nothing left to clear
+                if not result.get('success'):
+                    # The owner is alive but the forward failed; relay why
+                    self._audit('clear', session_id=session_id, success=False, error=result.get('error'))
+                    return jsonify(result)
+            else:
+                self.console_engine.clear_session(session_id)
             
             if self.enable_logging:
-                self.logger.info(f"Cleared session {session_id}")
+                self.logger.info("Cleared session %s", session_id)
+            self._audit('clear', session_id=session_id, success=True)
             
             return jsonify({'success': True, 'message': f'Session {session_id} cleared'})
         
+        @bp.route('/caches', methods=['GET'])
+        def caches():
+            """Report lru_cache hit rates and registered dict cache sizes"""
+            return jsonify(self.cache_census.census(
+                prefix=request.args.get('prefix'),
+                full_scan=request.args.get('full_scan', '').lower() == 'true'
+            ))
+        
+        @bp.route('/caches/clear', methods=['POST'])
+        def clear_cache():
+            """Clear one lru or dict cache"""
+            data = request.get_json(silent=True) or {}
+            name = data.get('name', '')
+            try:
+                self.cache_census.clear(name)
+            except KeyError as e:
+                return jsonify({'success': False, 'error': str(e.args[0])}), 404
+            self._audit('cache_clear', cache=name, success=True)
+            return jsonify({'success': True, 'message': f'Cache {name} cleared'})
+        
+        @bp.route('/caches/resize', methods=['POST'])
+        def resize_cache():
+            """Replace an lru cache with one of a different maxsize"""
+            data = request.get_json(silent=True) or {}
+            name = data.get('name', '')
+            maxsize = data.get('maxsize')
+            if maxsize is not None and not isinstance(maxsize, int):
+                return jsonify({'success': False, 'error': 'maxsize must be an integer or null'}), 400
+            try:
+                self.cache_census.resize(name, maxsize)
+            except KeyError as e:
+                return jsonify({'success': False, 'error': str(e.args[0])}), 404
+            self._audit('cache_resize', cache=name, maxsize=maxsize, success=True)
+            return jsonify({'success': True, 'message': f'Cache {name} resized to {maxsize}'})
+        
+        if self.request_capture:
+            @bp.route('/requests', methods=['GET'])
+            def captured_requests():
+                """List captured host-app requests, newest first"""
+                return jsonify({'requests': self.request_capture.list(
+                    limit=request.args.get('limit', 50, type=int),
+                    min_duration_ms=request.args.get('min_duration_ms', 0.0, type=float)
+                )})
+            
+            @bp.route('/requests/<int:capture_id>', methods=['GET'])
+            def captured_request(capture_id: int):
+                """Get one captured request including headers and body"""
+                entry = self.request_capture.describe(capture_id)
+                if entry is None:
+                    return jsonify({'success': False, 'error': f'No captured request with id {capture_id}'}), 404
+                return jsonify(entry)
+            
+            @bp.route('/requests/<int:capture_id>/replay', methods=['POST'])
+            def replay_request(capture_id: int):
+                """Replay a captured request in-process under the profiler"""
+                from .request_capture import MAX_REPLAYS
+                
+                data = request.get_json(silent=True) or {}
+                try:
+                    times = int(data.get('times', 1))
+                except (TypeError, ValueError):
+                    return jsonify({'success': False, 'error': 'times must be an integer'}), 400
+                if not 1 <= times <= MAX_REPLAYS:
+                    return jsonify({'success': False, 'error': f'times must be between 1 and {MAX_REPLAYS}'}), 400
+                for field in ('headers', 'query'):
+                    value = data.get(field)
+                    if value is not None and not (isinstance(value, dict) and all(
+                            isinstance(k, str) and isinstance(v, str) for k, v in value.items())):
+                        return jsonify({'success': False,
+                                        'error': f'{field} must be an object of string values'}), 400
+                
+                start = time.perf_counter()
+                result = self.request_capture.replay(
+                    capture_id,
+                    times=times,
+                    profile=bool(data.get('profile', True)),
+                    extra_headers=data.get('headers'),
+                    extra_query=data.get('query')
+                )
+                self._audit('replay', capture_id=capture_id, times=times,
+                            duration_ms=(time.perf_counter() - start) * 1000,
+                            success=result['success'])
+                return jsonify(result), 200 if result['success'] else 404
+        
+        if self.artifact_store:
+            @bp.route('/artifacts/<artifact_id>', methods=['GET'])
+            def artifact(artifact_id: str):
+                """Download a result spilled to disk; supports Range requests"""
+                # Expire old artifacts even when nothing new spills
+                self.artifact_store.collect_if_due()
+                found = self.artifact_store.find(artifact_id)
+                if found is None:
+                    return jsonify({'success': False, 'error': f'No artifact with id {artifact_id}'}), 404
+                
+                self._audit('artifact', artifact_id=artifact_id, success=True)
+                compressed = found['compressed']
+                return send_file(
+                    found['path'],
+                    mimetype='application/gzip' if compressed else 'text/plain',
+                    as_attachment=compressed,
+                    download_name=os.path.basename(found['path']),
+                    conditional=True,
+                    max_age=0
+                )
+        
+        if self.audit_log:
+            @bp.route('/audit', methods=['GET'])
+            def audit():
+                """Query recent audit events"""
+                success = request.args.get('success')
+                events = self.audit_log.query(
+                    limit=request.args.get('limit', 100, type=int),
+                    event=request.args.get('event'),
+                    user=request.args.get('user'),
+                    session_id=request.args.get('session_id'),
+                    success=None if success is None else success.lower() == 'true',
+                    since=request.args.get('since', type=float)
+                )
+                return jsonify({'events': events, 'stats': self.audit_log.get_stats()})
+        
+        if self.cluster:
+            @bp.route('/cluster/workers', methods=['GET'])
+            def cluster_workers():
+                """List the workers reachable for fan-out"""
+                self.cluster.start()
+                return jsonify({'pid': os.getpid(), 'workers': self.cluster.peers()})
+            
+            @bp.route('/cluster/execute', methods=['POST'])
+            def cluster_execute():
+                """Run code, an expression or a registered command on every worker"""
+                if not request.is_json:
+                    return jsonify({'success': False, 'error': 'Content-Type must be application/json'}), 400
+                
+                data = request.get_json()
+                if data.get('command'):
+                    message = {'op': 'command', 'command': data['command'], 'args': data.get('args', [])}
+                elif data.get('expression'):
+                    message = {'op': 'evaluate', 'expression': data['expression']}
+                elif data.get('code', '').strip():
+                    message = {'op': 'execute', 'code': data['code'].strip()}
+                else:
+                    return jsonify({'success': False, 'error': 'No code, expression or command provided'})
+                
+                from .cluster import REDUCERS
+                
+                reducer = data.get('reducer')
+                if reducer is not None and reducer not in REDUCERS:
+                    return jsonify({'success': False, 'error': f'Unknown reducer: {reducer}'}), 400
+                
+                try:
+                    deadline = float(data.get('deadline', 5.0))
+                    top_n = int(data.get('top_n', 10))
+                except (TypeError, ValueError):
+                    return jsonify({'success': False, 'error': 'deadline and top_n must be numbers'}), 400
+                if not 0 < deadline < float('inf') or top_n < 0:
+                    return jsonify({'success': False, 'error': 'deadline must be positive and top_n non-negative'}), 400
+                
+                if self.enable_logging and self.audit_log is None:
+                    self.logger.info("Cluster fan-out %s from session %s", message['op'], self._get_session_id())
+                
+                start = time.perf_counter()
+                result = self.cluster.fan_out(message, deadline=deadline, reducer=reducer, top_n=top_n)
+                
+                self._audit(
+                    'cluster_execute',
+                    session_id=self._get_session_id(),
+                    code=message.get('code') or message.get('expression') or message.get('command'),
+                    duration_ms=(time.perf_counter() - start) * 1000,
+                    success=result['success'],
+                    workers=result['worker_count'],
+                )
+                return jsonify(result)
+        
         return bp
     
+    def _audit(self, event: str, **fields: Any) -> None:
+        """Record an audit event for the current request, if auditing is enabled"""
+        if self.audit_log is None:
+            return
+        user = self.user_func() if self.user_func else None
+        self.audit_log.record(event, user=user, remote_addr=request.remote_addr, **fields)
+    
     def _get_session_id(self) -> str:
         """Get or create a session ID"""
-        if 'debug_console_session' not in session:
-            import uuid
-            session['debug_console_session'] = str(uuid.uuid4())
-        return session['debug_console_session']
+        session_id = session.get('debug_console_session')
+        # Cookies from before cluster mode hold unpinned IDs that every worker would treat as its own
+        if not session_id or (self.cluster and self.cluster.owner_of(session_id) is None):
+            session_id = session['debug_console_session'] = self._new_session_id()
+        return session_id
+    
+    def _new_session_id(self) -> str:
+        """Create a session ID, pinned to this worker in cluster mode"""
+        if self.cluster:
+            return self.cluster.new_session_id()
+        import uuid
+        return str(uuid.uuid4())
+    
+    def _run_in_session(self, message: Dict[str, Any], session_id: str) -> Dict[str, Any]:
+        """Run a session request, forwarding it to the owning worker in cluster mode"""
+        if not self.cluster:
+            return self.console_engine.execute(message['code'], session_id)
+        
+        from .cluster import SessionOwnerUnavailable
+        try:
+            return self.cluster.route(dict(message, session_id=session_id))
+        except SessionOwnerUnavailable as e:
+            lost_reason = str(e)
+        
+        # The owner died (e.g. worker recycled); continue in a fresh local session
+        new_session_id = self._new_session_id()
+        session['debug_console_session'] = new_session_id
+        if self.enable_logging:
+            self.logger.warning("%s; session %s replaced by %s", lost_reason, session_id, new_session_id)
+        result = self.cluster.route(dict(message, session_id=new_session_id))
+        result['session_reset'] = True
+        result['session_id'] = new_session_id
+        return result
 
 
 def create_console_blueprint(auth_func: Optional[Callable] = None,
@@ -335,7 +739,14 @@ def create_console_blueprint(auth_func: Optional[Callable] = None,
                            timeout: int = 5,
                            max_output_length: int = 10000,
                            exposed_globals: Optional[Dict[str, Any]] = None,
-                           enable_logging: bool = True) -> Blueprint:
+                           enable_logging: bool = True,
+                           cluster_run_dir: Optional[str] = None,
+                           cluster_commands: Optional[Dict[str, Callable]] = None,
+                           audit_log_path: Optional[str] = None,
+                           user_func: Optional[Callable] = None,
+                           capture_requests: int = 0,
+                           dict_caches: Optional[Dict[str, Any]] = None,
+                           artifact_dir: Optional[str] = None) -> Blueprint:
     """
     Create a debug console blueprint with the given configuration
     
@@ -346,21 +757,70 @@ def create_console_blueprint(auth_func: Optional[Callable] = None,
         max_output_length: Maximum length of output before truncation
         exposed_globals: Global variables to expose in console
         enable_logging: Whether to enable audit logging
+        cluster_run_dir: Shared directory for worker sockets; enables fan-out
+            across pre-fork workers (e.g. gunicorn) when set
+        cluster_commands: Named functions /cluster/execute can run on every
+            worker (requires cluster_run_dir)
+        audit_log_path: JSONL file for the structured audit log; when set,
+            audit events replace the per-execution log lines
+        user_func: Function returning the current user recorded in audit events
+        capture_requests: Number of recent host-app requests to keep for
+            inspection and replay (0 disables capture)
+        dict_caches: Named dict caches to include in the cache census
+        artifact_dir: Directory that output and values longer than
+            max_output_length are spilled to instead of being truncated;
+            they can be downloaded from /artifacts/<id>
     
     Returns:
         Flask Blueprint for the debug console
     """
-    console_engine = ConsoleEngine(
-        timeout=timeout,
-        max_output_length=max_output_length,
-        exposed_globals=exposed_globals
-    )
+    artifact_store = None
+    if artifact_dir:
+        from .artifacts import ArtifactStore
+        artifact_store = ArtifactStore(artifact_dir)
+    
+    def engine_factory() -> 'ConsoleEngine':
+        from .console_engine import ConsoleEngine
+        return ConsoleEngine(
+            timeout=timeout,
+            max_output_length=max_output_length,
+            exposed_globals=exposed_globals,
+            artifact_store=artifact_store
+        )
+    
+    cluster = None
+    if cluster_run_dir:
+        from .cluster import ClusterNode
+        # Resolved lazily so the engine is still only built on first use
+        cluster = ClusterNode(lambda: console_bp.console_engine, cluster_run_dir,
+                              commands=cluster_commands)
+    
+    audit_log = None
+    if audit_log_path:
+        from .audit import AuditLog
+        audit_log = AuditLog(audit_log_path)
+    
+    request_capture = None
+    if capture_requests:
+        from .request_capture import RequestCapture
+        request_capture = RequestCapture(max_requests=capture_requests)
+    
+    cache_census = None
+    if dict_caches:
+        from .cache_census import CacheCensus
+        cache_census = CacheCensus(dict_caches)
     
     console_bp = ConsoleBlueprint(
         url_prefix=url_prefix,
         auth_func=auth_func,
-        console_engine=console_engine,
-        enable_logging=enable_logging
+        enable_logging=enable_logging,
+        cluster=cluster,
+        audit_log=audit_log,
+        user_func=user_func,
+        engine_factory=engine_factory,
+        request_capture=request_capture,
+        cache_census=cache_census,
+        artifact_store=artifact_store
     )
     
     return console_bp.blueprint
\ No newline at end of file
@@ -0,0 +1,198 @@
+import cProfile
+import io
+import itertools
+import pstats
+import re
+import statistics
+import threading
+import time
+from collections import deque
+from typing import Dict, Any, Optional, List, Iterable
+from urllib.parse import parse_qsl, urlencode
+
+from flask import current_app
+
+
+# Set in the WSGI environ of replayed requests so they aren't captured again
+REPLAY_ENVIRON_KEY = 'debug_console.replay'
+
+REDACTED = '[REDACTED]'
+
+# Upper bound on replays per /requests/<id>/replay call
+MAX_REPLAYS = 100
+
+DEFAULT_REDACTED_HEADERS = frozenset({
+    'authorization', 'proxy-authorization', 'cookie', 'set-cookie', 'x-api-key', 'x-auth-token',
+})
+
+
+class RequestCapture:
+    """
+    Bounded in-memory buffer of the host app's most recent requests, with
+    in-process replay for measuring slow requests in a warm worker.
+
+    Header values matching the redaction rules, and query parameters whose
+    name matches redact_patterns, are replaced before storage and never
+    replayed; pass replacements to replay() via extra_headers/extra_query.
+    """
+
+    def __init__(self, max_requests: int = 100, max_body_bytes: int = 64 * 1024,
+                 redact_headers: Iterable[str] = DEFAULT_REDACTED_HEADERS,
+                 redact_patterns: Iterable[str] = (r'(?i)token', r'(?i)secret')):
+        self.max_body_bytes = max_body_bytes
+        self.redact_headers = {name.lower() for name in redact_headers}
+        self.redact_patterns = [re.compile(pattern) for pattern in redact_patterns]
+        self._buffer: deque = deque(maxlen=max_requests)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def _is_redacted(self, header: str) -> bool:
+        return (header.lower() in self.redact_headers or
+                any(pattern.search(header) for pattern in self.redact_patterns))
+
+    def _redact_query(self, query_string: str) -> str:
+        params = parse_qsl(query_string, keep_blank_values=True)
+        redacted = [any(pattern.search(name) for pattern in self.redact_patterns) for name, _ in params]
+        if not any(redacted):
+            return query_string  # keep the original encoding
+        return urlencode([(name, REDACTED if hide else value)
+                          for (name, value), hide in zip(params, redacted)])
+
+    def record(self, method: str, path: str, query_string: bytes, headers: Iterable,
+               body: Optional[bytes], status: int, duration_ms: float,
+               body_truncated: bool = False) -> Dict[str, Any]:
+        """Store one request in the buffer, evicting the oldest when full"""
+        entry = {
+            'method': method,
+            'path': path,
+            'query_string': self._redact_query(query_string.decode('latin-1')),
+            'headers': [(name, REDACTED if self._is_redacted(name) else value)
+                        for name, value in headers],
+            'body': body,
+            'body_truncated': body_truncated,
+            'status': status,
+            'duration_ms': duration_ms,
+            'timestamp': time.time(),
+        }
+        with self._lock:
+            entry['id'] = next(self._ids)
+            self._buffer.append(entry)
+        return entry
+
+    def list(self, limit: int = 50, min_duration_ms: float = 0.0) -> List[Dict[str, Any]]:
+        """Summaries of captured requests, newest first"""
+        with self._lock:
+            entries = list(self._buffer)
+        summaries = []
+        for entry in reversed(entries):
+            if len(summaries) >= limit:
+                break
+            if entry['duration_ms'] < min_duration_ms:
+                continue
+            summaries.append({key: entry[key] for key in
+                              ('id', 'method', 'path', 'status', 'duration_ms', 'timestamp')})
+        return summaries
+
+    def get(self, capture_id: int) -> Optional[Dict[str, Any]]:
+        """Get a captured request by ID"""
+        with self._lock:
+            for entry in self._buffer:
+                if entry['id'] == capture_id:
+                    return entry
+        return None
+
+    def describe(self, capture_id: int) -> Optional[Dict[str, Any]]:
+        """JSON-friendly view of a captured request"""
+        entry = self.get(capture_id)
+        if entry is None:
+            return None
+        body = entry['body']
+        return dict(entry, body=body.decode('utf-8', 'replace') if body is not None else None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._buffer.clear()
+
+    def replay(self, capture_id: int, times: int = 1, profile: bool = True,
+               extra_headers: Optional[Dict[str, str]] = None, top: int = 20,
+               app=None, extra_query: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+        """
+        Replay a captured request against the app's test client
+
+        Args:
+            capture_id: ID of the captured request
+            times: Number of replays to run
+            profile: Whether to run the replays under cProfile
+            extra_headers: Headers to add or override, e.g. for redacted auth
+            top: Number of functions to include in the profile report
+            app: Flask app to replay against (defaults to current_app)
+            extra_query: Query parameters to add or override, e.g. for redacted tokens
+
+        Returns:
+            Dict with per-replay status codes, timing distribution and profile
+        """
+        if times < 1:
+            raise ValueError("times must be at least 1")
+
+        entry = self.get(capture_id)
+        if entry is None:
+            return {'success': False, 'error': f'No captured request with id {capture_id}'}
+        if entry['body_truncated']:
+            return {'success': False, 'error': 'Request body exceeded the capture limit; cannot replay'}
+
+        headers = {name: value for name, value in entry['headers']
+                   if value != REDACTED and name.lower() not in ('content-length', 'host')}
+        headers.update(extra_headers or {})
+
+        query_string = entry['query_string']
+        query = parse_qsl(query_string, keep_blank_values=True)
+        extra_query = extra_query or {}
+        if extra_query or any(value == REDACTED for _, value in query):
+            query = [(name, value) for name, value in query
+                     if value != REDACTED and name not in extra_query]
+            query_string = urlencode(query + list(extra_query.items()))
+
+        client = (app or current_app._get_current_object()).test_client()
+        profiler = cProfile.Profile() if profile else None
+        timings, statuses = [], []
+
+        for _ in range(times):
+            if profiler:
+                profiler.enable()
+            start = time.perf_counter()
+            try:
+                response = client.open(
+                    entry['path'],
+                    method=entry['method'],
+                    query_string=query_string,
+                    headers=headers,
+                    data=entry['body'],
+                    environ_overrides={REPLAY_ENVIRON_KEY: True},
+                )
+            finally:
+                elapsed = (time.perf_counter() - start) * 1000
+                if profiler:
+                    profiler.disable()
+            timings.append(elapsed)
+            statuses.append(response.status_code)
+            response.close()
+
+        result = {
+            'success': True,
+            'id': capture_id,
+            'replays': times,
+            'statuses': statuses,
+            'original_duration_ms': entry['duration_ms'],
+            'timing_ms': {
+                'min': min(timings),
+                'mean': statistics.mean(timings),
+                'p50': statistics.median(timings),
+                'p90': sorted(timings)[min(len(timings) - 1, int(0.9 * len(timings)))],
+                'max': max(timings),
+            },
+        }
+        if profiler:
+            report = io.StringIO()
+            pstats.Stats(profiler, stream=report).sort_stats('cumulative').print_stats(top)
+            result['profile'] = report.getvalue()
+        return result
@@ -0,0 +1,110 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Callable, Hashable
+
+
+class _InFlight:
+    """Evaluation currently running for a cache key"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Optional[Dict[str, Any]] = None
+
+
+class ResultCache:
+    """
+    Bounded LRU cache of expression results with per-entry TTLs.
+
+    Concurrent lookups for the same key are coalesced: the first caller
+    evaluates, the others wait for its result instead of evaluating again.
+    """
+
+    def __init__(self, max_entries: int = 256, default_ttl: float = 2.0):
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self._entries: 'OrderedDict[Hashable, tuple]' = OrderedDict()
+        self._in_flight: Dict[Hashable, _InFlight] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Dict[str, Any]],
+                       ttl: Optional[float] = None) -> Dict[str, Any]:
+        """Return a cached result for key, computing it at most once per TTL"""
+        ttl = self.default_ttl if ttl is None else ttl
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, result = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return dict(result, cached=True)
+                del self._entries[key]
+                self.expirations += 1
+
+            flight = self._in_flight.get(key)
+            if flight is not None:
+                self.coalesced += 1
+                leader = False
+            else:
+                flight = self._in_flight[key] = _InFlight()
+                self.misses += 1
+                leader = True
+
+        if not leader:
+            flight.done.wait()
+            return dict(flight.result, cached=True)
+
+        try:
+            result = compute()
+        except BaseException as e:
+            result = {'success': False, 'error': str(e)}
+            raise
+        finally:
+            with self._lock:
+                # Failed evaluations are handed to waiters but never stored
+                if ttl > 0 and result.get('success'):
+                    self._entries[key] = (time.monotonic() + ttl, result)
+                    self._entries.move_to_end(key)
+                    while len(self._entries) > self.max_entries:
+                        self._entries.popitem(last=False)
+                        self.evictions += 1
+                del self._in_flight[key]
+            flight.result = result
+            flight.done.set()
+
+        return result
+
+    def discard_where(self, predicate: Callable[[Hashable], bool]) -> int:
+        """Drop cached results whose key matches predicate; returns how many were dropped"""
+        with self._lock:
+            keys = [key for key in self._entries if predicate(key)]
+            for key in keys:
+                del self._entries[key]
+        return len(keys)
+
+    def clear(self) -> None:
+        """Drop all cached results"""
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get hit/miss statistics for the cache"""
+        with self._lock:
+            lookups = self.hits + self.misses + self.coalesced
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'coalesced': self.coalesced,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'hit_rate': (self.hits + self.coalesced) / lookups if lookups else 0.0,
+            }
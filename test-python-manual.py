@@ -9,9 +9,8 @@ import os
 # Add the src directory to Python path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src', 'python'))
 
-# Import the console engine directly to avoid Flask dependency
-sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src', 'python', 'in_app_debug_console'))
-from console_engine import ConsoleEngine
+# The package imports lazily, so this doesn't require Flask
+from in_app_debug_console import ConsoleEngine
 
 def main():
     print("🧪 Running manual tests for Python Console Engine...\n")
@@ -64,6 +63,37 @@ def main():
         result = engine.execute('new_global["test"]', 'test-session')
         print(f"   new_global['test'] = {result.get('output', 'No output')}")
         
+        print("\n✅ Testing result cache...")
+        cached_engine = ConsoleEngine(result_cache_size=16, exposed_globals={'test_data': {'value': 42}})
+        cached_engine.evaluate_expression('test_data["value"]', 'session-a')
+        result = cached_engine.evaluate_expression('test_data[ "value" ]', 'session-b')
+        print(f"   Served from cache: {'✅' if result.get('cached') else '❌'}")
+        print(f"   Cache stats: {cached_engine.get_stats()['result_cache']}")
+        
+        print("\n✅ Testing concurrent executions...")
+        import threading
+        concurrent_engine = ConsoleEngine(max_output_length=100000)
+        results = {}
+        
+        def run(session_id):
+            results[session_id] = concurrent_engine.execute(
+                f'[print("{session_id}") for _ in range(2000)] and None', session_id)
+        
+        threads = [threading.Thread(target=run, args=(f'thread-{i}',)) for i in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        isolated = len(results) == 2 and all(results[sid]['output'] == f'{sid}\n' * 2000 for sid in results)
+        print(f"   Output kept per thread: {'✅' if isolated else '❌'}")
+        if not isolated:
+            raise AssertionError(f"Concurrent executions mixed their output: {results}")
+        
+        stream_intact = sys.stdout.encoding is not None and sys.stderr.fileno() == 2
+        print(f"   Real stream attributes still visible: {'✅' if stream_intact else '❌'}")
+        if not stream_intact:
+            raise AssertionError("sys.stdout/sys.stderr lost their encoding or file descriptor")
+        
         print("\n🎉 All manual tests completed successfully!")
         
     except Exception as error:
@@ -0,0 +1,6 @@
+import os
+import sys
+
+# Import the package from the source tree, like test-python-manual.py
+SRC_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'src', 'python'))
+sys.path.insert(0, SRC_DIR)
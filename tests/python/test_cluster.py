@@ -0,0 +1,277 @@
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+from in_app_debug_console import ConsoleEngine
+from in_app_debug_console.cluster import ClusterNode, SessionOwnerUnavailable
+from in_app_debug_console.console_engine import _ThreadTimeout, _Watchdog
+
+
+SRC_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'src', 'python'))
+
+# A sibling worker: one cluster node serving until it is killed
+WORKER_SCRIPT = """
+import sys, time
+sys.path.insert(0, sys.argv[1])
+from in_app_debug_console import ConsoleEngine
+from in_app_debug_console.cluster import ClusterNode
+node = ClusterNode(ConsoleEngine(timeout=2), sys.argv[2],
+                   commands={'one': lambda: 1, 'name': lambda: 'sibling'})
+node.start()
+while True:
+    time.sleep(60)
+"""
+
+
+def wait_for(path, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while not os.path.exists(path):
+        if time.monotonic() > deadline:
+            raise AssertionError(f"{path} did not appear")
+        time.sleep(0.02)
+
+
+def dead_pid():
+    """Pid of a process that has already exited and been reaped"""
+    process = subprocess.Popen([sys.executable, '-c', 'pass'])
+    process.wait()
+    return process.pid
+
+
+@pytest.fixture
+def run_dir(tmp_path):
+    return str(tmp_path / 'run')
+
+
+@pytest.fixture
+def node(run_dir):
+    node = ClusterNode(ConsoleEngine(timeout=2), run_dir, forward_timeout=3,
+                       commands={'one': lambda: 1, 'name': lambda: 'local'})
+    yield node
+    node.stop()
+
+
+@pytest.fixture
+def sibling(run_dir):
+    """A second worker process with its own cluster node"""
+    process = subprocess.Popen([sys.executable, '-c', WORKER_SCRIPT, SRC_DIR, run_dir])
+    try:
+        wait_for(os.path.join(run_dir, f'worker-{process.pid}.sock'))
+        yield process
+    finally:
+        process.kill()
+        process.wait()
+
+
+@pytest.fixture
+def live_process():
+    """A live process with no cluster node, to own fake sockets"""
+    process = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(60)'])
+    yield process
+    process.kill()
+    process.wait()
+
+
+def fake_worker(run_dir, pid, reply=b''):
+    """Listen on pid's socket, read one request, send reply and drop the connection"""
+    os.makedirs(run_dir, exist_ok=True)
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(os.path.join(run_dir, f'worker-{pid}.sock'))
+    server.listen(8)
+
+    def serve():
+        while True:
+            try:
+                conn, _ = server.accept()
+            except OSError:
+                return
+            with conn:
+                conn.recv(65536)
+                if reply:
+                    conn.sendall(reply)
+
+    threading.Thread(target=serve, daemon=True).start()
+    return server
+
+
+def test_route_forwards_to_owner(node, sibling):
+    session_id = f'w{sibling.pid}-session'
+
+    result = node.route({'op': 'execute', 'code': 'x = 41', 'session_id': session_id})
+    assert result['success']
+    assert result['pid'] == sibling.pid
+    assert result['forwarded_by'] == os.getpid()
+
+    # State lives in the owner's session
+    result = node.route({'op': 'evaluate', 'expression': 'x + 1', 'session_id': session_id})
+    assert result['value'] == 42
+    assert node.console_engine.sessions == {}
+
+
+def test_route_runs_local_sessions_in_process(node):
+    result = node.route({'op': 'execute', 'code': 'print(1)', 'session_id': node.new_session_id()})
+    assert result['success']
+    assert result['pid'] == os.getpid()
+    assert 'forwarded_by' not in result
+
+
+def test_fan_out_reduces_across_workers(node, sibling):
+    result = node.fan_out({'op': 'command', 'command': 'one'}, deadline=5, reducer='sum')
+    assert result['success']
+    assert result['worker_count'] == 2
+    assert result['reduced'] == 2
+    assert {w['pid'] for w in result['workers']} == {os.getpid(), sibling.pid}
+
+    result = node.fan_out({'op': 'evaluate', 'expression': '[1, 2]'}, reducer='merge')
+    assert result['reduced'] == [1, 2, 1, 2]
+
+
+def test_fan_out_keeps_results_when_reducer_fails(node, sibling):
+    result = node.fan_out({'op': 'command', 'command': 'name'}, reducer='sum')
+    assert result['success']
+    assert result['reduced'] == 0
+
+    result = node.fan_out({'op': 'evaluate', 'expression': '[1, "a"]'}, reducer='top')
+    assert 'reduce_error' in result
+    assert len(result['workers']) == 2
+
+
+def test_dead_owner_is_unavailable(node, run_dir):
+    pid = dead_pid()
+    with pytest.raises(SessionOwnerUnavailable):
+        node.route({'op': 'execute', 'code': '1', 'session_id': f'w{pid}-session'})
+
+    # Also when its stale socket still accepts and drops the connection
+    server = fake_worker(run_dir, pid)
+    try:
+        with pytest.raises(SessionOwnerUnavailable):
+            node.route({'op': 'execute', 'code': '1', 'session_id': f'w{pid}-session'})
+    finally:
+        server.close()
+
+
+def test_owner_dropping_connection_returns_error(node, run_dir, live_process):
+    server = fake_worker(run_dir, live_process.pid)
+    try:
+        result = node.route({'op': 'execute', 'code': '1', 'session_id': f'w{live_process.pid}-s'})
+    finally:
+        server.close()
+    assert not result['success']
+    assert 'closed the connection' in result['error']
+    assert result['pid'] == live_process.pid
+
+
+def test_owner_sending_unreadable_reply_returns_error(node, run_dir, live_process):
+    server = fake_worker(run_dir, live_process.pid, reply=b'{"success": tr')
+    try:
+        result = node.route({'op': 'execute', 'code': '1', 'session_id': f'w{live_process.pid}-s'})
+    finally:
+        server.close()
+    assert not result['success']
+    assert result['error'].startswith(f'Forwarding to worker {live_process.pid} failed')
+
+
+def blueprint_client(node):
+    from flask import Flask
+    from in_app_debug_console import ConsoleBlueprint
+
+    app = Flask(__name__)
+    app.secret_key = 'test'
+    app.register_blueprint(ConsoleBlueprint(console_engine=node.console_engine, cluster=node,
+                                            enable_logging=False).blueprint)
+    return app.test_client()
+
+
+def test_execute_resets_session_of_dead_owner(node):
+    pytest.importorskip('flask')
+    client = blueprint_client(node)
+    lost_session = f'w{dead_pid()}-session'
+    with client.session_transaction() as session:
+        session['debug_console_session'] = lost_session
+
+    result = client.post('/__console__/execute', json={'code': 'print("hi")'}).get_json()
+    assert result['success']
+    assert result['session_reset']
+    assert result['output'] == 'hi\n'
+    assert node.owner_of(result['session_id']) == os.getpid()
+    with client.session_transaction() as session:
+        assert session['debug_console_session'] == result['session_id']
+
+
+def test_clear_relays_failed_forward(node, run_dir, live_process):
+    pytest.importorskip('flask')
+    client = blueprint_client(node)
+    server = fake_worker(run_dir, live_process.pid)
+    try:
+        result = client.post(f'/__console__/clear/w{live_process.pid}-s').get_json()
+    finally:
+        server.close()
+    assert not result['success']
+    assert 'closed the connection' in result['error']
+
+
+def test_watchdog_interrupts_worker_thread():
+    outcome = {}
+
+    def run():
+        try:
+            with _Watchdog(0.2):
+                while True:
+                    pass
+        except _ThreadTimeout:
+            outcome['timed_out'] = True
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    thread.join(5)
+    assert not thread.is_alive()
+    assert outcome == {'timed_out': True}
+
+
+def test_cancelled_watchdog_does_not_fire():
+    outcome = {}
+
+    def run():
+        try:
+            with _Watchdog(0.1):
+                pass
+            time.sleep(0.3)  # would be interrupted if the timer were still armed
+            outcome['finished'] = True
+        except _ThreadTimeout:
+            outcome['interrupted'] = True
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    thread.join(5)
+    assert outcome == {'finished': True}
+
+
+def test_execute_times_out_off_the_main_thread():
+    engine = ConsoleEngine(timeout=1)
+    results = []
+    thread = threading.Thread(
+        target=lambda: results.append(engine.execute('[0 for _ in iter(int, 1)]', 'session')))
+    start = time.monotonic()
+    thread.start()
+    thread.join(10)
+
+    assert not thread.is_alive()
+    assert time.monotonic() - start < 5
+    assert not results[0]['success']
+    assert 'timed out' in results[0]['error']
+    assert 'debug_console_execution_timeouts_total 1' in engine.metrics.render()
+
+
+def test_command_times_out_on_socket_thread(node, run_dir):
+    node.commands['spin'] = lambda: [0 for _ in iter(int, 1)]
+    node.start()
+    start = time.monotonic()
+    result = node.send(os.getpid(), {'op': 'command', 'command': 'spin'}, timeout=10)
+    assert not result['success']
+    assert 'timed out' in result['error']
+    assert time.monotonic() - start < 5